@@ -1,5 +1,7 @@
 import os
 
+from sqlalchemy.pool import StaticPool
+
 
 class Config(object):
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
@@ -8,5 +10,92 @@ class Config(object):
     JWT_BLACKLIST_ENABLED = True
     JWT_BLACKLIST_TOKEN_CHECKS = ['access', 'refresh']
     JWT_ACCESS_TOKEN_EXPIRES = 7200
+    # Full werkzeug method string including the iteration count. Changing
+    # either value rehashes passwords transparently on the next login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD',
+                                          'pbkdf2:sha256:150000')
+    PASSWORD_SALT_LENGTH = int(os.environ.get('PASSWORD_SALT_LENGTH', 8))
     CORS_HEADERS = 'Content-Type'
     FRONTEND_URL = os.environ.get('FRONTEND_URL')
+    # Build the catalog indexes in create_app; gunicorn.conf.py turns this
+    # on when the app is preloaded in the master.
+    WARM_UP_ON_START = os.environ.get('WARM_UP_ON_START') == '1'
+    SIMILAR_COCKTAILS_TOP_K = 10
+    MAIN_INGREDIENT_WEIGHT = 2.0
+    # Maintain similar cocktail lists in a background thread of each worker
+    # instead of inside the write request.
+    SIMILARITY_UPDATE_ASYNC = True
+    AUTOCOMPLETE_LIMIT = 10
+    BATCH_MAX_IDS = 200
+    SHOPPING_LIST_MAX_ITEMS = 500
+    # View and search-hit counts are buffered per worker and written at
+    # least this often (seconds) or once this many are pending.
+    POPULARITY_FLUSH_INTERVAL = 10.0
+    POPULARITY_FLUSH_MAX = 1000
+    SINGLE_FLIGHT_CROSS_PROCESS = (
+        os.environ.get('SINGLE_FLIGHT_CROSS_PROCESS') == '1')
+    SINGLE_FLIGHT_LOCK_TIMEOUT = 5.0
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_URL = os.environ.get('REDIS_URL')
+    CACHE_SHM_PATH = os.environ.get('CACHE_SHM_PATH',
+                                    '/dev/shm/cocktail_bar_cache')
+    CACHE_MAX_ENTRIES = 4096
+    CACHE_SWEEP_INTERVAL = 60.0
+    CACHE_DEFAULT_TTL = 300
+    CACHE_VERSION_POLL_INTERVAL = 1.0
+    TOKEN_CACHE_TTL = 60
+    # Built by `flask build-snapshot`; unset to always read from the database.
+    CATALOG_SNAPSHOT_PATH = os.environ.get('CATALOG_SNAPSHOT_PATH')
+    CATALOG_SNAPSHOT_POLL_INTERVAL = 1.0
+    CHANGES_PAGE_SIZE = 500
+    # Every open stream holds a worker for up to CHANGE_STREAM_TIMEOUT
+    # seconds; only enable it with an async worker class (gevent/eventlet).
+    CHANGE_STREAM_ENABLED = os.environ.get('CHANGE_STREAM_ENABLED') == '1'
+    CHANGE_STREAM_POLL_INTERVAL = 2.0
+    CHANGE_STREAM_TIMEOUT = 55
+    # Number of proxies in front of the app whose X-Forwarded-For entry is
+    # trusted, so rate limits apply per client address. Heroku (which sets
+    # DYNO) has one router in front of every dyno.
+    TRUSTED_PROXY_COUNT = int(os.environ.get(
+        'TRUSTED_PROXY_COUNT', 1 if 'DYNO' in os.environ else 0))
+    # Behind an untrusted proxy every client shares the proxy's address, so
+    # admission control is off by default until the proxies are known.
+    ADMISSION_ENABLED = os.environ.get(
+        'ADMISSION_ENABLED', '1' if TRUSTED_PROXY_COUNT else '0') == '1'
+    # Token bucket per client, in cost units: a plain /cocktails page costs
+    # 1, filters, searches and deep pages cost more. Search-as-you-type
+    # spends about 3 per keystroke (7 for the first two), so the burst
+    # covers a few typed queries and the rate a fast typist.
+    ADMISSION_RATE = 20.0
+    ADMISSION_BURST = 240
+    ADMISSION_COST_PER_FILTER = 1
+    ADMISSION_COST_SEARCH = 2
+    # Searches shorter than a trigram cannot use the search index.
+    ADMISSION_COST_SHORT_SEARCH = 6
+    ADMISSION_COST_PAGE_STEP = 10
+    # Queries costing this much share ADMISSION_MAX_EXPENSIVE slots per
+    # worker; keep it below the size of the database pool.
+    ADMISSION_EXPENSIVE_COST = 4
+    ADMISSION_MAX_EXPENSIVE = 3
+    ADMISSION_QUEUE_TIMEOUT = 0.5
+    ADMISSION_RETRY_AFTER = 1
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    # One connection for the whole app, so every session and the migrations
+    # share the same in-memory database.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': StaticPool,
+        'connect_args': {'check_same_thread': False}
+    }
+    SECRET_KEY = 'test'
+    FRONTEND_URL = '*'
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1'
+    CACHE_BACKEND = 'memory'
+    CATALOG_SNAPSHOT_PATH = None
+    SINGLE_FLIGHT_CROSS_PROCESS = False
+    WARM_UP_ON_START = False
+    SIMILARITY_UPDATE_ASYNC = False
+    ADMISSION_ENABLED = False
@@ -0,0 +1,82 @@
+import os
+import time
+
+# Import the app and warm the catalog once in the master; workers are
+# forked with the indexes already built. Set GUNICORN_PRELOAD=0 to load the
+# app in every worker instead.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+if preload_app:
+    os.environ.setdefault('WARM_UP_ON_START', '1')
+
+# Workers only see each other's writes (catalog versions, revoked tokens)
+# through a shared cache; the memory backend is private to each process.
+# Use CACHE_BACKEND=redis when more than one host serves the app.
+os.environ.setdefault('CACHE_BACKEND', 'shm')
+
+
+def on_starting(server):
+    if server.cfg.workers > 1 and os.environ['CACHE_BACKEND'] == 'memory':
+        raise RuntimeError('CACHE_BACKEND=memory is not shared between '
+                           'workers; use shm or redis, or run one worker')
+
+
+def _app():
+    from run import server
+    return server
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        startup = _app().extensions['startup']
+        server.log.info('App preloaded in %.2fs (catalog warm-up %.2fs)',
+                        startup['create_app'], startup.get('warm_up', 0.0))
+
+
+def post_fork(server, worker):
+    worker.started_at = time.monotonic()
+
+    if server.cfg.preload_app:
+        from server import db
+        app = _app()
+        # The pool is copied by fork; connections of the master must never
+        # be used by two processes.
+        with app.app_context():
+            db.engine.dispose()
+
+
+def post_worker_init(worker):
+    from sqlalchemy import exc
+    from server import db
+    app = _app()
+    # Open the first pooled connection before the first request arrives.
+    try:
+        with app.app_context():
+            db.engine.connect().close()
+    except exc.SQLAlchemyError as e:
+        worker.log.warning('Worker %s could not connect: %s', worker.pid, e)
+
+    worker.log.info('Worker %s ready in %.2fs', worker.pid,
+                    time.monotonic() - worker.started_at)
+
+
+def pre_request(worker, req):
+    worker.request_started_at = time.monotonic()
+
+
+def post_request(worker, req, environ, resp):
+    if not getattr(worker, 'served_first_request', False):
+        worker.served_first_request = True
+        now = time.monotonic()
+        worker.log.info('Worker %s served its first request in %.0fms, '
+                        '%.2fs after fork', worker.pid,
+                        (now - worker.request_started_at) * 1000,
+                        now - worker.started_at)
+
+
+def worker_exit(server, worker):
+    from server.catalog.popularity import popularity_counter
+    app = _app()
+    # Buffered view counts would otherwise be lost on a graceful restart.
+    with app.app_context():
+        popularity_counter.flush()
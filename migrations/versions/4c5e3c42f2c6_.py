@@ -7,7 +7,8 @@ Create Date: 2020-12-26 21:27:55.172060
 """
 from alembic import op
 import sqlalchemy as sa
-from sqlalchemy.dialects import postgresql
+
+from server.db_types import GUID
 
 # revision identifiers, used by Alembic.
 revision = '4c5e3c42f2c6'
@@ -19,14 +20,14 @@ depends_on = None
 def upgrade():
     # ### commands auto generated by Alembic - please adjust! ###
     op.create_table('glassware',
-    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('id', GUID(), nullable=False),
     sa.Column('name', sa.String(length=255), nullable=False),
     sa.PrimaryKeyConstraint('id'),
     sa.UniqueConstraint('id'),
     sa.UniqueConstraint('name')
     )
     op.create_table('ingredient',
-    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('id', GUID(), nullable=False),
     sa.Column('name', sa.String(length=255), nullable=False),
     sa.Column('type', sa.String(length=255), nullable=False),
     sa.PrimaryKeyConstraint('id'),
@@ -34,14 +35,14 @@ def upgrade():
     sa.UniqueConstraint('name')
     )
     op.create_table('method',
-    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('id', GUID(), nullable=False),
     sa.Column('name', sa.String(length=255), nullable=False),
     sa.PrimaryKeyConstraint('id'),
     sa.UniqueConstraint('id'),
     sa.UniqueConstraint('name')
     )
     op.create_table('token_blacklist',
-    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('id', GUID(), nullable=False),
     sa.Column('jti', sa.String(length=36), nullable=False),
     sa.Column('token_type', sa.String(length=10), nullable=False),
     sa.Column('user_identity', sa.String(length=50), nullable=False),
@@ -51,7 +52,7 @@ def upgrade():
     sa.UniqueConstraint('id')
     )
     op.create_table('user',
-    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('id', GUID(), nullable=False),
     sa.Column('username', sa.String(length=255), nullable=False),
     sa.Column('password', sa.String(length=255), nullable=False),
     sa.PrimaryKeyConstraint('id'),
@@ -59,12 +60,12 @@ def upgrade():
     )
     op.create_index(op.f('ix_user_username'), 'user', ['username'], unique=True)
     op.create_table('cocktail',
-    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('id', GUID(), nullable=False),
     sa.Column('name', sa.String(length=255), nullable=False),
     sa.Column('preparation', sa.String(), nullable=True),
     sa.Column('garnish', sa.String(length=255), nullable=True),
-    sa.Column('glassware_id', postgresql.UUID(as_uuid=True), nullable=True),
-    sa.Column('method_id', postgresql.UUID(as_uuid=True), nullable=True),
+    sa.Column('glassware_id', GUID(), nullable=True),
+    sa.Column('method_id', GUID(), nullable=True),
     sa.Column('img_url', sa.String(), nullable=True),
     sa.ForeignKeyConstraint(['glassware_id'], ['glassware.id'], ),
     sa.ForeignKeyConstraint(['method_id'], ['method.id'], ),
@@ -72,9 +73,9 @@ def upgrade():
     sa.UniqueConstraint('id')
     )
     op.create_table('cocktail_ingredients',
-    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
-    sa.Column('cocktail_id', postgresql.UUID(as_uuid=True), nullable=False),
-    sa.Column('ingredient_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('id', GUID(), nullable=False),
+    sa.Column('cocktail_id', GUID(), nullable=False),
+    sa.Column('ingredient_id', GUID(), nullable=False),
     sa.Column('amount', sa.String(length=255), nullable=True),
     sa.Column('main', sa.Boolean(), nullable=True),
     sa.ForeignKeyConstraint(['cocktail_id'], ['cocktail.id'], ),
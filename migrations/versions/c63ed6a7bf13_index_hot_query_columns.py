@@ -0,0 +1,68 @@
+"""index hot query columns and drop redundant unique constraints
+
+Revision ID: c63ed6a7bf13
+Revises: c50408230922
+Create Date: 2026-10-19 12:20:44.913067
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c63ed6a7bf13'
+down_revision = 'c50408230922'
+branch_labels = None
+depends_on = None
+
+# Every table was created with UNIQUE(id) next to its primary key, which
+# builds and maintains a second identical index on every insert.
+REDUNDANT_UNIQUE_IDS = ['glassware', 'ingredient', 'method', 'token_blacklist',
+                        'user', 'cocktail', 'cocktail_ingredients']
+
+
+def upgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+
+    # SQLite cannot drop constraints in place; the extra unique index only
+    # costs write speed there.
+    if postgresql:
+        for table in REDUNDANT_UNIQUE_IDS:
+            op.drop_constraint(f'{table}_id_key', table, type_='unique')
+
+    op.create_index(op.f('ix_cocktail_name'), 'cocktail', ['name'],
+                    unique=False)
+    op.create_index(op.f('ix_cocktail_glassware_id'), 'cocktail',
+                    ['glassware_id'], unique=False)
+    op.create_index(op.f('ix_cocktail_method_id'), 'cocktail', ['method_id'],
+                    unique=False)
+    op.create_index(op.f('ix_cocktail_ingredients_cocktail_id'),
+                    'cocktail_ingredients', ['cocktail_id'], unique=False)
+    op.create_index(op.f('ix_cocktail_ingredients_ingredient_id'),
+                    'cocktail_ingredients', ['ingredient_id'], unique=False)
+    op.create_index(op.f('ix_token_blacklist_jti'), 'token_blacklist',
+                    ['jti'], unique=True)
+
+    # Other databases get a plain index on search_text.
+    if postgresql:
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_cocktail_card_search_text', 'cocktail_card',
+                    ['search_text'], unique=False, postgresql_using='gin',
+                    postgresql_ops={'search_text': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_cocktail_card_search_text', table_name='cocktail_card')
+    op.drop_index(op.f('ix_token_blacklist_jti'),
+                  table_name='token_blacklist')
+    op.drop_index(op.f('ix_cocktail_ingredients_ingredient_id'),
+                  table_name='cocktail_ingredients')
+    op.drop_index(op.f('ix_cocktail_ingredients_cocktail_id'),
+                  table_name='cocktail_ingredients')
+    op.drop_index(op.f('ix_cocktail_method_id'), table_name='cocktail')
+    op.drop_index(op.f('ix_cocktail_glassware_id'), table_name='cocktail')
+    op.drop_index(op.f('ix_cocktail_name'), table_name='cocktail')
+
+    if op.get_bind().dialect.name == 'postgresql':
+        for table in REDUNDANT_UNIQUE_IDS:
+            op.create_unique_constraint(f'{table}_id_key', table, ['id'])
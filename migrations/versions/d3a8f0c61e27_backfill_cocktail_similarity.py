@@ -0,0 +1,110 @@
+"""backfill cocktail similarity
+
+Revision ID: d3a8f0c61e27
+Revises: b7d41e2a9c05
+Create Date: 2026-10-20 09:14:52.106383
+
+"""
+from alembic import op
+import heapq
+import math
+
+import sqlalchemy as sa
+from flask import current_app
+
+from server.db_types import GUID
+
+# revision identifiers, used by Alembic.
+revision = 'd3a8f0c61e27'
+down_revision = 'b7d41e2a9c05'
+branch_labels = None
+depends_on = None
+
+cocktail_ingredients = sa.table(
+    'cocktail_ingredients',
+    sa.column('cocktail_id', GUID()),
+    sa.column('ingredient_id', GUID()),
+    sa.column('main', sa.Boolean()))
+
+cocktail_similarity = sa.table(
+    'cocktail_similarity',
+    sa.column('cocktail_id', GUID()),
+    sa.column('similar_id', GUID()),
+    sa.column('rank', sa.Integer()),
+    sa.column('score', sa.Float()))
+
+
+# The scoring below is a frozen copy of server.catalog.similarity as of
+# this revision, so later changes to the app do not change what this
+# migration writes: cosine similarity of the cocktail x ingredient matrix,
+# main ingredients weighted by MAIN_INGREDIENT_WEIGHT, top k per cocktail.
+
+
+def _vectors(rows, main_weight):
+    vectors = {}
+    for cocktail_id, ingredient_id, main in rows:
+        vectors.setdefault(cocktail_id, {})[ingredient_id] = (
+            main_weight if main else 1.0)
+
+    return vectors
+
+
+def _similarity_rows(vectors, k):
+    postings = {}
+    for cocktail_id, vector in vectors.items():
+        for ingredient_id, weight in vector.items():
+            postings.setdefault(ingredient_id, []).append(
+                (cocktail_id, weight))
+    norms = {cocktail_id: math.sqrt(sum(w * w for w in vector.values()))
+             for cocktail_id, vector in vectors.items()}
+
+    for cocktail_id, vector in vectors.items():
+        dots = {}
+        for ingredient_id, weight in vector.items():
+            for other_id, other_weight in postings[ingredient_id]:
+                if other_id != cocktail_id:
+                    dots[other_id] = dots.get(other_id, 0.0) + (
+                        weight * other_weight)
+
+        norm = norms[cocktail_id]
+        top = heapq.nlargest(k, ((dot / (norm * norms[other_id]), other_id)
+                                 for other_id, dot in dots.items()))
+        for rank, (score, similar_id) in enumerate(top):
+            yield {
+                'cocktail_id': cocktail_id,
+                'similar_id': similar_id,
+                'rank': rank,
+                'score': score
+            }
+
+
+def upgrade():
+    # The table was created empty, so existing cocktails had no similar
+    # cocktails until `flask rebuild-similar` was run. Databases where it
+    # was already run are left alone.
+    connection = op.get_bind()
+    if connection.execute(sa.select([sa.func.count()]).select_from(
+            cocktail_similarity)).scalar():
+        return
+
+    vectors = _vectors(
+        connection.execute(sa.select([
+            cocktail_ingredients.c.cocktail_id,
+            cocktail_ingredients.c.ingredient_id,
+            cocktail_ingredients.c.main])),
+        current_app.config['MAIN_INGREDIENT_WEIGHT'])
+
+    rows = []
+    for row in _similarity_rows(
+            vectors, current_app.config['SIMILAR_COCKTAILS_TOP_K']):
+        rows.append(row)
+        if len(rows) >= 1000:
+            op.bulk_insert(cocktail_similarity, rows)
+            rows = []
+    if rows:
+        op.bulk_insert(cocktail_similarity, rows)
+
+
+def downgrade():
+    # Similarity rows are derived data; there is nothing to undo.
+    pass
@@ -0,0 +1,170 @@
+"""add parsed ingredient quantities
+
+Revision ID: e4b82d6f15a3
+Revises: a1f3c9d27b64
+Create Date: 2026-10-19 17:05:31.908214
+
+"""
+import re
+from fractions import Fraction
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e4b82d6f15a3'
+down_revision = 'a1f3c9d27b64'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of server.catalog.quantities as of this revision, so later
+# changes to the parser do not change what this migration stores.
+
+# Volume units and their size in millilitres. Everything measured by
+# volume is normalized to ml so amounts from different recipes add up.
+_VOLUMES = {
+    'ml': 1.0,
+    'cl': 10.0,
+    'dl': 100.0,
+    'l': 1000.0,
+    'oz': 29.5735,
+    'shot': 44.0,
+    'tsp': 4.93,
+    'tbsp': 14.79,
+    'barspoon': 5.0,
+    'cup': 236.59,
+    'dash': 0.92,
+    'drop': 0.05,
+    'splash': 5.0,
+}
+
+# Counted units, kept as they are.
+_COUNTS = {'piece', 'slice', 'wedge', 'leaf', 'sprig', 'cube', 'pinch',
+           'twist', 'peel', 'whole'}
+
+_ALIASES = {
+    'milliliter': 'ml', 'millilitre': 'ml', 'centiliter': 'cl',
+    'centilitre': 'cl', 'liter': 'l', 'litre': 'l', 'ounce': 'oz',
+    'fl oz': 'oz', 'teaspoon': 'tsp', 'tablespoon': 'tbsp',
+    'bar spoon': 'barspoon', 'leave': 'leaf', 'leaves': 'leaf',
+    'dashes': 'dash', 'pinches': 'pinch', 'splashes': 'splash',
+}
+
+# Size of cocktail_ingredients.unit.
+_MAX_UNIT_LENGTH = 20
+
+_UNICODE_FRACTIONS = {'½': ' 1/2', '⅓': ' 1/3', '⅔': ' 2/3', '¼': ' 1/4',
+                      '¾': ' 3/4', '⅛': ' 1/8'}
+
+_NUMBER = r'\d+(?:[.,]\d+)?(?:\s+\d+/\d+)?|\d+/\d+'
+_AMOUNT = re.compile(
+    rf'^\s*(?P<number>{_NUMBER})(?:\s*(?:-|to)\s*(?:{_NUMBER}))?'
+    rf'\s*(?P<unit>[a-z][a-z ]*?)?\.?\s*$')
+
+
+def _number(text):
+    return float(sum(Fraction(part.replace(',', '.'))
+                     for part in text.split()))
+
+
+def _known(text):
+    for candidate in (text, text[:-1] if text.endswith('s') else text):
+        candidate = _ALIASES.get(candidate, candidate)
+        if candidate in _VOLUMES or candidate in _COUNTS:
+            return candidate
+
+    return None
+
+
+def _singular(noun):
+    for suffix, replacement in (('ies', 'y'), ('ches', 'ch'),
+                                ('shes', 'sh'), ('xes', 'x')):
+        if noun.endswith(suffix):
+            return noun[:-len(suffix)] + replacement
+
+    return noun[:-1] if noun.endswith('s') and not noun.endswith('ss') \
+        else noun
+
+
+def _unit(text):
+    if not text:
+        return 'piece'
+
+    # "4 oz soda" is measured in oz, "6 mint leaves" in leaves.
+    words = text.split()
+    for end in range(len(words), 0, -1):
+        unit = _known(' '.join(words[:end]))
+        if unit is not None:
+            return unit
+    unit = _known(words[-1])
+    if unit is not None:
+        return unit
+
+    # Anything else is counted in its own noun: "1/2 lemon", "2 eggs".
+    noun = ' '.join(words[:-1] + [_singular(words[-1])])
+    return noun if len(noun) <= _MAX_UNIT_LENGTH else None
+
+
+def _parse_amount(amount):
+    """
+    Parses a free-form amount such as "1 1/2 oz", "30 ml", "2 dashes" or
+    "¾ oz" into (quantity, unit). Volumes are converted to ml, counted
+    units are kept and any other noun ("1/2 lemon") is counted as a unit of
+    its own, ranges use their lower bound. Returns (None, None) for amounts
+    that cannot be measured, e.g. "Top up".
+    """
+    if not amount:
+        return None, None
+
+    text = re.sub(r'^\s*an?\s+', '1 ', amount.lower())
+    for char, fraction in _UNICODE_FRACTIONS.items():
+        text = text.replace(char, fraction)
+
+    match = _AMOUNT.match(text)
+    if match is None:
+        return None, None
+
+    unit = _unit((match.group('unit') or '').strip())
+    if unit is None:
+        return None, None
+
+    quantity = _number(match.group('number'))
+    if unit in _VOLUMES:
+        return round(quantity * _VOLUMES[unit], 2), 'ml'
+
+    return quantity, unit
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.add_column('cocktail_ingredients',
+                  sa.Column('quantity', sa.Float(), nullable=True))
+    op.add_column('cocktail_ingredients',
+                  sa.Column('unit', sa.String(length=20), nullable=True))
+    # ### end Alembic commands ###
+
+    # Amounts repeat a lot ("1 oz", "2 dashes"), so every distinct amount
+    # is parsed once and written with one UPDATE per amount.
+    connection = op.get_bind()
+    amounts = [amount for (amount, ) in connection.execute(sa.text(
+        'SELECT DISTINCT amount FROM cocktail_ingredients '
+        'WHERE amount IS NOT NULL'))]
+
+    update = sa.text('UPDATE cocktail_ingredients '
+                     'SET quantity = :quantity, unit = :unit '
+                     'WHERE amount = :amount')
+    rows = []
+    for amount in amounts:
+        quantity, unit = _parse_amount(amount)
+        if quantity is not None:
+            rows.append({'amount': amount, 'quantity': quantity,
+                         'unit': unit})
+    if rows:
+        connection.execute(update, rows)
+
+
+def downgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_column('cocktail_ingredients', 'unit')
+    op.drop_column('cocktail_ingredients', 'quantity')
+    # ### end Alembic commands ###
@@ -1,21 +1,33 @@
+import time
+
 from flask import Flask
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from config import Config
-from server.extensions import jwt, db, migrate
+from server.extensions import jwt as jwt_manager, db, migrate, cache
 
 
 def create_app(config_class=Config):
+    start = time.perf_counter()
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    if app.config['TRUSTED_PROXY_COUNT']:
+        app.wsgi_app = ProxyFix(app.wsgi_app,
+                                x_for=app.config['TRUSTED_PROXY_COUNT'])
+
     CORS(app,
          resources={r'/*': {'origins': app.config.get('FRONTEND_URL')}},
          supports_credentials=True)
 
     db.init_app(app)
     migrate.init_app(app, db)
-    jwt.init_app(app)
+    jwt_manager.init_app(app)
+    cache.init_app(app)
+
+    from server.catalog.sync import catalog_changed
+    cache.namespace('catalog').on_change(catalog_changed)
 
     from server.errors import bp as errors_bp
     app.register_blueprint(errors_bp)
@@ -26,6 +38,22 @@ def create_app(config_class=Config):
     from server.api_user import bp as api_user_bp
     app.register_blueprint(api_user_bp)
 
+    from server.api_menu import bp as api_menu_bp
+    app.register_blueprint(api_menu_bp)
+
+    from server.cli import bp as cli_bp
+    app.register_blueprint(cli_bp)
+
+    startup = app.extensions['startup'] = {}
+    if app.config['WARM_UP_ON_START']:
+        from server.catalog.warmup import warm_up
+        with app.app_context():
+            startup['warm_up'] = warm_up()
+            # Workers forked from this process must open their own
+            # connections.
+            db.engine.dispose()
+    startup['create_app'] = time.perf_counter() - start
+
     return app
 
 
@@ -0,0 +1,103 @@
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import abort, current_app, request
+
+from server.cache import MemoryBackend
+from server.extensions import cache
+
+logger = logging.getLogger(__name__)
+
+
+def _take(cost, rate, burst):
+    """
+    Returns the token bucket update taking cost tokens: the bucket is
+    refilled at rate tokens per second up to burst. The result is 0 when
+    the tokens were taken, otherwise the seconds until they are available.
+    """
+    def update(state):
+        now = time.time()
+        tokens, updated_at = state or (burst, now)
+        tokens = min(burst, tokens + max(0.0, now - updated_at) * rate)
+        if tokens >= cost:
+            return (tokens - cost, now), 0
+        return (tokens, now), (cost - tokens) / rate
+
+    return update
+
+
+class AdmissionControl(object):
+    """
+    Sheds load before it reaches the database. Every client has a token
+    bucket of ADMISSION_BURST tokens refilled at ADMISSION_RATE per second
+    and each request takes tokens by its estimated cost; a client out of
+    tokens gets a 429. The buckets live in the cache backend, so with a
+    shared backend the limit holds across workers; if the backend fails a
+    per-worker bucket is used instead.
+
+    Expensive queries also need one of ADMISSION_MAX_EXPENSIVE slots of the
+    worker, which has its own database pool. A query waits up to
+    ADMISSION_QUEUE_TIMEOUT seconds for a slot and gets a 503 otherwise.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = MemoryBackend()
+        self._slots = None
+
+    def _update(self, key, fn, ttl):
+        try:
+            return cache.backend.update(key, fn, ttl)
+        except Exception as e:
+            # The limiter must never take the API down with the cache.
+            logger.warning('Rate limiter falling back to memory: %s', e)
+            return self._local.update(key, fn, ttl)
+
+    def charge(self, cost):
+        config = current_app.config
+        if not config['ADMISSION_ENABLED']:
+            return
+
+        rate = config['ADMISSION_RATE']
+        burst = config['ADMISSION_BURST']
+        # A bucket left alone this long is full again and can be dropped.
+        ttl = int(math.ceil(burst / rate)) + 1
+        wait = self._update(f'admission:{request.remote_addr}',
+                            _take(min(cost, burst), rate, burst), ttl)
+        if wait:
+            abort(429, 'Too many requests',
+                  retry_after=int(math.ceil(wait)))
+
+    def _semaphore(self):
+        if self._slots is None:
+            with self._lock:
+                if self._slots is None:
+                    self._slots = threading.BoundedSemaphore(
+                        current_app.config['ADMISSION_MAX_EXPENSIVE'])
+
+        return self._slots
+
+    @contextmanager
+    def slot(self):
+        """
+        Holds one of the worker's slots for expensive queries.
+        """
+        config = current_app.config
+        if not config['ADMISSION_ENABLED']:
+            yield
+            return
+
+        slots = self._semaphore()
+        if not slots.acquire(timeout=config['ADMISSION_QUEUE_TIMEOUT']):
+            abort(503, 'Server busy',
+                  retry_after=config['ADMISSION_RETRY_AFTER'])
+        try:
+            yield
+        finally:
+            slots.release()
+
+
+admission = AdmissionControl()
@@ -1,18 +1,44 @@
 import os
-from flask import abort
-from sqlalchemy import func, exc, or_, and_
+import uuid
+from functools import lru_cache
+from flask import abort, current_app
+from sqlalchemy import exc
+from sqlalchemy.orm import joinedload, selectinload
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
 
 from server import db
-from server.models import Cocktail, Ingredient, Glassware, Method
-
-cloudinary.config(
-    cloud_name=os.environ.get('CLD_NAME'),
-    api_key=os.environ.get('CLD_API_KEY'),
-    api_secret=os.environ.get('CLD_API_SECRET')
-)
+from server.admission import admission
+from server.catalog.autocomplete import autocomplete_index
+from server.catalog.bulk import select_cocktail_ids, delete_cocktails
+from server.catalog.cache import catalog_cache
+from server.catalog.cards import card_filters, refresh_card
+from server.catalog.changes import (UPSERT, DELETE, record_change,
+                                    changes_since)
+from server.catalog.filters import group_filters
+from server.catalog.pantry import MAX_MISSING, pantry_index
+from server.catalog.popularity import popularity_counter
+from server.catalog.similarity import detach_similarities
+from server.catalog.singleflight import catalog_flight
+from server.catalog.snapshot import catalog_snapshot
+from server.catalog.sync import (cocktail_saved, cocktail_deleted,
+                                 cocktails_deleted)
+from server.models import (Cocktail, CocktailCard, CocktailIngredients,
+                           CocktailSimilarity, Ingredient, Glassware, Method)
+
+
+@lru_cache(maxsize=None)
+def _configure_cloudinary():
+    """
+    Configures the Cloudinary client on the first upload instead of at
+    import, so starting a worker does not depend on it.
+    """
+    cloudinary.config(
+        cloud_name=os.environ.get('CLD_NAME'),
+        api_key=os.environ.get('CLD_API_KEY'),
+        api_secret=os.environ.get('CLD_API_SECRET')
+    )
 
 
 def add_ingredient(data):
@@ -86,6 +112,7 @@ def add_cocktail(data):
 
     if 'image' in list(data.keys()):
         try:
+            _configure_cloudinary()
             cocktail_img = cloudinary.uploader.upload(
                 data['image']['url'],
                 folder='cocktails/',
@@ -115,6 +142,8 @@ def add_cocktail(data):
             cocktail_ingredient.main = ing.get('main')
 
         db.session.add(new_cocktail)
+        refresh_card(new_cocktail)
+        record_change(new_cocktail.id, UPSERT)
         db.session.commit()
 
     except exc.DataError:
@@ -122,6 +151,8 @@ def add_cocktail(data):
     except exc.SQLAlchemyError:
         abort(500, 'Internal server error')
 
+    cocktail_saved(new_cocktail)
+
     return new_cocktail
 
 
@@ -129,7 +160,14 @@ def delete_cocktail(cocktail_id):
     try:
         cocktail = db.session.query(Cocktail).filter(
             Cocktail.id == cocktail_id).first()
+
+        if not cocktail:
+            abort(404, 'Not Found')
+
+        deleted_id = cocktail.id
+        neighbour_ids = detach_similarities([deleted_id])
         db.session.delete(cocktail)
+        record_change(deleted_id, DELETE)
         db.session.commit()
 
     except exc.DataError:
@@ -137,176 +175,630 @@ def delete_cocktail(cocktail_id):
     except exc.SQLAlchemyError:
         abort(500, 'Internal server error')
 
+    cocktail_deleted(deleted_id, neighbour_ids)
+
     return cocktail_id
 
 
+def _diff_ingredients(cocktail, ingredients):
+    """
+    Brings the ingredient rows of a cocktail in line with the submitted
+    list, touching only the rows that differ: removed ingredients are
+    deleted, new ones inserted and changed amounts or main flags updated.
+    Returns whether anything changed.
+    """
+    current = {ci.ingredient.name: ci for ci in cocktail.cocktail_ingredients}
+    wanted = {ing['name']: ing for ing in ingredients}
+    changed = False
+
+    for name in current.keys() - wanted.keys():
+        cocktail.cocktail_ingredients.remove(current[name])
+        db.session.delete(current[name])
+        changed = True
+
+    for name in current.keys() & wanted.keys():
+        ci, ing = current[name], wanted[name]
+        if ci.amount != ing.get('amount'):
+            ci.amount = ing.get('amount')
+            changed = True
+        if ci.main != ing.get('main'):
+            ci.main = ing.get('main')
+            changed = True
+
+    added = [name for name in wanted if name not in current]
+    if added:
+        existing = {
+            ingredient.name: ingredient for ingredient in
+            db.session.query(Ingredient).filter(Ingredient.name.in_(added))
+        }
+        for name in added:
+            ing = wanted[name]
+            ingredient = existing.get(name)
+            if ingredient is None:
+                ingredient = Ingredient(name=name, type=ing['type'])
+                db.session.add(ingredient)
+            cocktail.cocktail_ingredients.append(CocktailIngredients(
+                ingredient=ingredient,
+                amount=ing.get('amount'),
+                main=ing.get('main')))
+        changed = True
+
+    return changed
+
+
+def _get_or_create(model, name):
+    instance = db.session.query(model).filter(model.name == name).first()
+    if not instance:
+        instance = model(name=name)
+        db.session.add(instance)
+
+    return instance
+
+
+def _filter_ids(criteria):
+    """
+    Ids of the cocktails matching a bulk delete filter: a search string, a
+    non-empty list of ingredient names, or both.
+    """
+    if not isinstance(criteria, dict):
+        abort(400, 'Invalid request')
+
+    search = criteria.get('search')
+    ingredients = criteria.get('ingredients')
+
+    if search is not None and not (isinstance(search, str) and
+                                   search.strip()):
+        abort(400, 'Invalid request')
+    if ingredients is not None and not (
+            isinstance(ingredients, list) and ingredients and
+            all(isinstance(name, str) and name.strip()
+                for name in ingredients)):
+        abort(400, 'Invalid request')
+    # An empty filter would match the whole catalog.
+    if search is None and ingredients is None:
+        abort(400, 'Invalid request')
+
+    return select_cocktail_ids(search.lower() if search else None,
+                               sorted(ingredients or []))
+
+
+def bulk_delete_cocktails(data):
+    """
+    Deletes the cocktails listed in data['ids'] or matching data['filter']
+    ({"search": ..., "ingredients": [...]}), and with data['gc'] also the
+    ingredients, glassware and methods left unused.
+
+    The search of a filter is a substring match over names and
+    preparations, so a filter delete only runs when data['confirm'] is the
+    number of cocktails it matches. With data['dry_run'] that number is
+    returned and nothing is deleted.
+    """
+    if not isinstance(data, dict):
+        abort(400, 'Invalid request')
+
+    cocktail_ids = data.get('ids')
+    criteria = data.get('filter')
+
+    if (cocktail_ids is None) == (criteria is None):
+        abort(400, 'Invalid request')
+
+    try:
+        if cocktail_ids is not None:
+            if not isinstance(cocktail_ids, list):
+                abort(400, 'Invalid request')
+            cocktail_ids = [uuid.UUID(str(i)) for i in cocktail_ids]
+        else:
+            cocktail_ids = _filter_ids(criteria)
+            matched = len(cocktail_ids)
+            if data.get('dry_run'):
+                return {'matched': matched}
+            confirm = data.get('confirm')
+            if isinstance(confirm, bool) or confirm != matched:
+                abort(400, f'Filter matches {matched} cocktails, send '
+                           f'"confirm": {matched} to delete them')
+
+        deleted_ids, neighbour_ids, counts = delete_cocktails(
+            cocktail_ids, bool(data.get('gc')))
+        db.session.commit()
+
+    except (ValueError, AttributeError, TypeError):
+        abort(400, 'Invalid request')
+    except exc.DataError:
+        abort(400, 'Invalid name')
+    except exc.SQLAlchemyError:
+        abort(500, 'Internal server error')
+
+    if deleted_ids:
+        cocktails_deleted(deleted_ids, neighbour_ids)
+
+    return counts
+
+
 def edit_cocktail(cocktail_id, data):
     cocktail = None
-    ingredient_list = []
-    cocktail_ings = []
 
     try:
-        cocktail = db.session.query(Cocktail).filter(
-            Cocktail.id == cocktail_id).first()
+        cocktail = (
+            db.session.query(Cocktail)
+              .options(selectinload(Cocktail.cocktail_ingredients)
+                       .joinedload(CocktailIngredients.ingredient),
+                       joinedload(Cocktail.glassware),
+                       joinedload(Cocktail.method))
+              .filter(Cocktail.id == cocktail_id)
+              .first()
+        )
 
         if not cocktail:
             abort(500, 'Internal server error')
 
-        if 'glassware' in list(data.keys()):
-            glassware = db.session.query(Glassware).filter(
-                Glassware.name == data['glassware']).first()
-            if not glassware:
-                glassware = add_glassware(data['glassware'])
-            cocktail.glassware = glassware
-
-        if 'method' in list(data.keys()):
-            method = db.session.query(Method).filter(
-                Method.name == data['method']).first()
-            if not method:
-                method = add_glassware(data['method'])
-            cocktail.method = method
-
-        if 'ingredients' in list(data.keys()):
-            for ing in data['ingredients']:
-                ingredient = db.session.query(Ingredient).filter(
-                    Ingredient.name == ing['name']).first()
-                if not ingredient:
-                    ingredient = add_ingredient(ing)
-                ingredient_list.append(ingredient)
-            cocktail.ingredients = ingredient_list
-
-        for cocktail_ingredient in cocktail.cocktail_ingredients:
-            ing = [i for i in data['ingredients']
-                   if i['name'] == cocktail_ingredient.ingredient.name][0]
-            cocktail_ingredient.amount = ing.get('amount')
-            cocktail_ingredient.main = ing.get('main')
-            cocktail_ings.append(cocktail_ingredient)
-        cocktail.cocktail_ingredients = cocktail_ings
+        changed = False
 
-        cocktail.name = data['name']
-        cocktail.preparation = data['preparation']
-        cocktail.garnish = data['garnish']
+        if 'glassware' in data and (cocktail.glassware is None or
+                                    cocktail.glassware.name !=
+                                    data['glassware']):
+            cocktail.glassware = _get_or_create(Glassware, data['glassware'])
+            changed = True
 
-        db.session.commit()
+        if 'method' in data and (cocktail.method is None or
+                                 cocktail.method.name != data['method']):
+            cocktail.method = _get_or_create(Method, data['method'])
+            changed = True
+
+        if 'ingredients' in data:
+            changed = _diff_ingredients(cocktail, data['ingredients']) or \
+                changed
+
+        for attr in ('name', 'preparation', 'garnish'):
+            if getattr(cocktail, attr) != data[attr]:
+                setattr(cocktail, attr, data[attr])
+                changed = True
+
+        if changed:
+            refresh_card(cocktail)
+            record_change(cocktail.id, UPSERT)
+            db.session.commit()
 
     except exc.DataError:
         abort(400, 'Invalid name')
     except exc.SQLAlchemyError:
         abort(500, 'Internal server error')
 
+    if changed:
+        cocktail_saved(cocktail)
+
     return cocktail
 
 
-def get_cocktail(cocktail_id):
-    cocktail = None
+# Fields that can be requested with fields=. main_ingredients is derived
+# from the ingredient list; the others are keys of the card document.
+FIELDS = ('id', 'name', 'img_url', 'preparation', 'garnish', 'method',
+          'glassware', 'ingredients', 'main_ingredients')
+
+
+def _fields_arg(args):
+    if 'fields' not in args:
+        return None
+
+    fields = tuple(dict.fromkeys(
+        field.strip() for field in args['fields'].split(',')
+        if field.strip()))
+
+    if not fields or any(field not in FIELDS for field in fields):
+        abort(400, 'Invalid request')
+
+    return fields
+
+
+def _project(document, fields):
+    if document is None or fields is None:
+        return document
+
+    projected = {}
+    for field in fields:
+        if field == 'main_ingredients':
+            projected[field] = [ing['name'] for ing in document['ingredients']
+                                if ing['main']]
+        else:
+            projected[field] = document[field]
+
+    return projected
+
+
+def _projection_columns(fields):
+    """
+    Columns loading only the requested fields: name and img_url come from
+    their own card columns, everything else is extracted from the document
+    by the database so the rest of it is never sent over the wire.
+    """
+    columns = {}
+    for field in fields:
+        if field == 'id':
+            continue
+        if field in ('name', 'img_url'):
+            columns[field] = getattr(CocktailCard, field)
+        else:
+            key = 'ingredients' if field == 'main_ingredients' else field
+            columns[key] = CocktailCard.document[key]
+
+    return columns
+
+
+def _hydrate(cocktail_ids, fields=None):
+    """
+    Loads cocktail documents by id, from the per-cocktail cache and then
+    with one query for the rest. With fields set the documents are reduced
+    to those fields and cache misses load only the matching columns; such
+    partial documents are not cached.
+    """
+    documents = {}
+    missing = []
+    version = catalog_cache.version
+
+    for cocktail_id in cocktail_ids:
+        document = catalog_cache.get_document(cocktail_id)
+        if document is None:
+            missing.append(cocktail_id)
+        else:
+            documents[cocktail_id] = _project(document, fields)
+
+    if missing:
+        try:
+            if fields is None:
+                cards = db.session.query(CocktailCard.cocktail_id,
+                                         CocktailCard.document).filter(
+                    CocktailCard.cocktail_id.in_(missing))
+                for cocktail_id, document in cards:
+                    catalog_cache.set_document(cocktail_id, document,
+                                               version)
+                    documents[cocktail_id] = document
+            else:
+                columns = _projection_columns(fields)
+                cards = db.session.query(CocktailCard.cocktail_id,
+                                         *columns.values()).filter(
+                    CocktailCard.cocktail_id.in_(missing))
+                for cocktail_id, *values in cards:
+                    document = dict(zip(columns, values),
+                                    id=str(cocktail_id))
+                    documents[cocktail_id] = _project(document, fields)
+        except exc.DataError:
+            abort(400, 'Invalid name')
+        except exc.SQLAlchemyError:
+            abort(500, 'Internal server error')
+
+    return documents
+
+
+def get_cocktail(cocktail_id, args):
+    fields = _fields_arg(args)
 
     try:
-        cocktail = db.session.query(Cocktail).filter(
-            Cocktail.id == cocktail_id).first()
-    except exc.DataError:
+        cocktail_id = uuid.UUID(cocktail_id)
+    except ValueError:
         abort(400, 'Invalid name')
-    except exc.SQLAlchemyError:
-        abort(500, 'Internal server error')
+
+    snapshot = catalog_snapshot.current()
+    if snapshot is not None:
+        cocktail = _project(snapshot.get(cocktail_id), fields)
+    else:
+        cocktail = _hydrate([cocktail_id], fields).get(cocktail_id)
 
     if not cocktail:
         abort(404, 'Not Found')
     else:
+        popularity_counter.record_view(cocktail_id)
         return cocktail
 
 
-def find_cocktails(args):
+def get_cocktails_batch(cocktail_ids, args):
+    """
+    Returns the cocktails with the given ids in the requested order, plus
+    the ids that were not found or are not valid ids.
+    """
+    fields = _fields_arg(args)
+
+    if not isinstance(cocktail_ids, list) or \
+            len(cocktail_ids) > current_app.config['BATCH_MAX_IDS']:
+        abort(400, 'Invalid request')
+
+    requested = []
+    missing = []
+    for cocktail_id in dict.fromkeys(str(i).strip() for i in cocktail_ids):
+        try:
+            requested.append((cocktail_id, uuid.UUID(cocktail_id)))
+        except ValueError:
+            missing.append(cocktail_id)
+
+    snapshot = catalog_snapshot.current()
+    if snapshot is not None:
+        documents = {key: _project(snapshot.get(key), fields)
+                     for _, key in requested}
+    else:
+        documents = _hydrate([key for _, key in requested], fields)
+
     cocktails = []
-    total = 0
-    num_of_cocktails = 20
-    search_list = []
-    filter_list = []
+    for cocktail_id, key in requested:
+        if documents.get(key) is None:
+            missing.append(cocktail_id)
+        else:
+            cocktails.append(documents[key])
+
+    return cocktails, missing
+
+
+SORTS = ('name', 'popular')
+
+
+def _search_args(args):
     curr_page = 1
+    search = None
+    sort = args.get('sort', 'name')
     keys = list(args.keys())
 
-    if len(keys) == 0:
-        cocktails = db.session.query(Cocktail).all()
+    if sort not in SORTS:
+        abort(400, 'Invalid sort')
 
     if 'page' in keys:
         curr_page = int(args['page'])
 
     if 'search' in keys:
-        search_value = func.lower(args['search'])
-        search_list.append(
-            func.lower(Cocktail.name).contains(search_value))
-        search_list.append(
-            func.lower(Cocktail.preparation).contains(search_value))
-        search_list.append(
-            func.lower(Cocktail.garnish).contains(search_value))
-        search_list.append(
-            func.lower(Ingredient.name).contains(search_value))
+        search = args['search'].lower()
 
     ingredients = [args.get(ing).split(',') for ing in keys
                    if ing in ['mixer', 'spirit', 'wine', 'liqueur'] and
                    args.get(ing) is not None]
-    ingredients = [ing for sublist in ingredients for ing in sublist]
+    ingredients = sorted({ing for sublist in ingredients for ing in sublist})
+
+    return search, tuple(ingredients), curr_page, sort
 
-    for ing in ingredients:
-        filter_list.append(Cocktail.ingredients.any(name=ing))
+
+def _search_cards(search, ingredients, curr_page, sort):
+    cocktail_ids = []
+    total = 0
+    num_of_cocktails = 20
+    filter_list = card_filters(search, ingredients)
+    version = catalog_cache.version
+
+    query = db.session.query(CocktailCard.cocktail_id).filter(*filter_list)
+    if sort == 'popular':
+        query = query.join(Cocktail,
+                           Cocktail.id == CocktailCard.cocktail_id) \
+            .order_by(Cocktail.views.desc(), CocktailCard.name)
+    else:
+        query = query.order_by(CocktailCard.name)
 
     try:
-        cocktails = (
-            db.session.query(Cocktail, func.count(Cocktail.id).over())
-              .order_by(Cocktail.name)
-              .join(*Cocktail.ingredients.attr)
-              .filter(and_(or_(*search_list), *filter_list))
-              .distinct()
-              .paginate(curr_page, num_of_cocktails)
-        )
+        cocktails = query.paginate(curr_page, num_of_cocktails)
 
         total = cocktails.total
-        cocktails = cocktails.items
+        cocktail_ids = [cocktail_id for (cocktail_id, ) in cocktails.items]
     except exc.SQLAlchemyError as e:
         abort(500, e)
 
-    return cocktails, total
+    catalog_cache.set_query(
+        ('find_cocktails', search, ingredients, curr_page, sort),
+        (cocktail_ids, total), version)
 
+    return cocktail_ids, total
 
-def get_filters():
-    filters = [
-        {
-            'name': 'Spirit',
-            'label': 'spirit',
-            'value': []
-        },
-        {
-            'name': 'Liqueur',
-            'label': 'liqueur',
-            'value': []
-        },
-        {
-            'name': 'Wine/Vermouth',
-            'label': 'wine',
-            'value': []
-        },
-        {
-            'name': 'Mixer',
-            'label': 'mixer',
-            'value': []
-        }
-    ]
 
+def _query_cost(search, ingredients, curr_page):
+    """
+    Estimates the database cost of a /cocktails query in the units of the
+    admission token buckets.
+    """
+    config = current_app.config
+    cost = 1 + len(ingredients) * config['ADMISSION_COST_PER_FILTER']
+
+    if search is not None and len(search) < 3:
+        cost += config['ADMISSION_COST_SHORT_SEARCH']
+    elif search is not None:
+        cost += config['ADMISSION_COST_SEARCH']
+
+    # OFFSET pagination reads every row before the page.
+    return cost + max(curr_page - 1, 0) // \
+        config['ADMISSION_COST_PAGE_STEP']
+
+
+def _search_cards_admitted(search, ingredients, curr_page, sort, cost):
+    if cost < current_app.config['ADMISSION_EXPENSIVE_COST']:
+        return _search_cards(search, ingredients, curr_page, sort)
+
+    with admission.slot():
+        return _search_cards(search, ingredients, curr_page, sort)
+
+
+def find_cocktails(args):
+    search, ingredients, curr_page, sort = _search_args(args)
+    fields = _fields_arg(args)
+    key = ('find_cocktails', search, ingredients, curr_page, sort)
+
+    snapshot = catalog_snapshot.current()
+    if snapshot is not None and search is None and sort == 'name':
+        cocktails, total = snapshot.find(ingredients, curr_page)
+        # Out of range pages keep the 404 raised by paginate.
+        if cocktails or curr_page == 1:
+            admission.charge(1)
+            popularity_counter.record_hits(
+                uuid.UUID(cocktail['id']) for cocktail in cocktails)
+            return [_project(cocktail, fields)
+                    for cocktail in cocktails], total
+
+    # Cached results cost as much as a plain page.
+    result = catalog_cache.get_query(key)
+    if result is None:
+        cost = _query_cost(search, ingredients, curr_page)
+        admission.charge(cost)
+        result = catalog_flight.do(
+            key, lambda: _search_cards_admitted(
+                search, ingredients, curr_page, sort, cost),
+            lambda: catalog_cache.get_query(key))
+    else:
+        admission.charge(1)
+
+    cocktail_ids, total = result
+    popularity_counter.record_hits(cocktail_ids)
+    documents = _hydrate(cocktail_ids, fields)
+
+    return [documents[cocktail_id] for cocktail_id in cocktail_ids
+            if cocktail_id in documents], total
+
+
+def find_makeable_cocktails(args):
+    num_of_cocktails = 20
+    curr_page = 1
+    max_missing = 0
+    keys = list(args.keys())
+
+    if 'ingredients' not in keys:
+        abort(400, 'Invalid request')
+
+    pantry = [ing for ing in args['ingredients'].split(',') if ing.strip()]
+    ignore_garnish = args.get('ignore_garnish', '').lower() in ('1', 'true')
+
+    try:
+        if 'missing' in keys:
+            max_missing = int(args['missing'])
+        if 'page' in keys:
+            curr_page = int(args['page'])
+    except ValueError:
+        abort(400, 'Invalid request')
+
+    if max_missing not in range(MAX_MISSING + 1) or curr_page < 1:
+        abort(400, 'Invalid request')
+
+    start = (curr_page - 1) * num_of_cocktails
+    total, matches = pantry_index.match(pantry, max_missing, ignore_garnish,
+                                        start, start + num_of_cocktails)
+
+    cocktails = _hydrate([cocktail_id for cocktail_id, _ in matches])
+    makeable = [dict(cocktails[cocktail_id], missing=missing)
+                for cocktail_id, missing in matches
+                if cocktail_id in cocktails]
+
+    return makeable, total
+
+
+def get_similar_cocktails(cocktail_id, args):
+    limit = current_app.config['SIMILAR_COCKTAILS_TOP_K']
+
+    try:
+        cocktail_id = uuid.UUID(cocktail_id)
+    except ValueError:
+        abort(400, 'Invalid name')
+
+    if 'limit' in args:
+        try:
+            limit = min(int(args['limit']), limit)
+        except ValueError:
+            abort(400, 'Invalid request')
+
+    similar = []
+
+    try:
+        similar = (
+            db.session.query(Cocktail.id, Cocktail.name, Cocktail.img_url,
+                             CocktailSimilarity.score)
+              .join(CocktailSimilarity,
+                    CocktailSimilarity.similar_id == Cocktail.id)
+              .filter(CocktailSimilarity.cocktail_id == cocktail_id)
+              .order_by(CocktailSimilarity.rank)
+              .limit(limit)
+              .all()
+        )
+    except exc.DataError:
+        abort(400, 'Invalid name')
+    except exc.SQLAlchemyError:
+        abort(500, 'Internal server error')
+
+    return [{
+        'id': c.id,
+        'name': c.name,
+        'img_url': c.img_url,
+        'score': c.score
+    } for c in similar]
+
+
+def get_suggestions(args):
+    limit = current_app.config['AUTOCOMPLETE_LIMIT']
+
+    if 'limit' in args:
+        try:
+            limit = min(int(args['limit']), limit)
+        except ValueError:
+            abort(400, 'Invalid request')
+
+    suggestions = autocomplete_index.suggest(args.get('q', ''), limit)
+
+    return [{
+        'name': name,
+        'type': term_type
+    } for term_type, name in suggestions]
+
+
+def _change_args(args, last_event_id=None):
+    since = 0
+    limit = current_app.config['CHANGES_PAGE_SIZE']
+
+    try:
+        if last_event_id:
+            since = int(last_event_id)
+        elif 'since' in args:
+            since = int(args['since'])
+        if 'limit' in args:
+            limit = min(int(args['limit']), limit)
+    except ValueError:
+        abort(400, 'Invalid request')
+
+    if since < 0 or limit < 1:
+        abort(400, 'Invalid request')
+
+    return since, limit
+
+
+def get_changes(args):
+    since, limit = _change_args(args)
+
+    try:
+        changes, seq, more = changes_since(since, limit)
+    except exc.SQLAlchemyError:
+        abort(500, 'Internal server error')
+
+    return {
+        'changes': changes,
+        'seq': seq,
+        'more': more
+    }
+
+
+def get_change_stream_start(args, last_event_id):
+    if not current_app.config['CHANGE_STREAM_ENABLED']:
+        abort(404, 'Change stream is not enabled')
+
+    since, _ = _change_args(args, last_event_id)
+
+    return since
+
+
+def _load_filters():
+    version = catalog_cache.version
     result = db.session.query(Ingredient.name,
                               Ingredient.type).order_by(Ingredient.name).all()
+    filters = group_filters(result)
 
-    ingredients = [
-        {
-            'name': ingredient.name,
-            'type': ingredient.type
-        } for ingredient in result]
-
-    for ing in ingredients:
-        if ing['type'] == 'Spirit':
-            filters[0]['value'].append(ing['name'])
-        elif ing['type'] == 'Liqueur':
-            filters[1]['value'].append(ing['name'])
-        elif ing['type'] == 'Mixer':
-            filters[3]['value'].append(ing['name'])
-        else:
-            filters[2]['value'].append(ing['name'])
+    catalog_cache.set_query(('get_filters', ), filters, version)
 
     return filters
+
+
+def get_filters():
+    snapshot = catalog_snapshot.current()
+    if snapshot is not None:
+        return snapshot.filters()
+
+    result = catalog_cache.get_query(('get_filters', ))
+    if result is None:
+        result = catalog_flight.do(
+            ('get_filters', ), _load_filters,
+            lambda: catalog_cache.get_query(('get_filters', )))
+
+    return result
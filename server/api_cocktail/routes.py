@@ -1,9 +1,12 @@
-from flask import request, abort
+from flask import request, abort, Response, stream_with_context
 from flask_jwt_extended import jwt_required
 from server.api_cocktail import bp
 from server.api_cocktail.controllers import (
     add_cocktail, get_cocktail, find_cocktails, get_filters, delete_cocktail,
-    edit_cocktail)
+    edit_cocktail, find_makeable_cocktails, get_similar_cocktails,
+    get_suggestions, get_changes, get_change_stream_start,
+    get_cocktails_batch, bulk_delete_cocktails)
+from server.catalog.changes import stream_changes
 
 
 @bp.route('/cocktail', methods=['POST'])
@@ -13,14 +16,21 @@ def add_new_cocktail():
         data = request.get_json()
         result = add_cocktail(data)
 
-        return {'message': result.to_dict}
+        return {'message': result.to_dict()}
 
 
 @bp.route('/cocktail/<cocktail_id>')
 def get_single_cocktail(cocktail_id):
-    result = get_cocktail(cocktail_id)
+    result = get_cocktail(cocktail_id, request.args)
 
-    return {'message': result.to_dict}
+    return {'message': result}
+
+
+@bp.route('/cocktail/<cocktail_id>/similar')
+def similar_cocktails(cocktail_id):
+    result = get_similar_cocktails(cocktail_id, request.args)
+
+    return {'message': result}
 
 
 @bp.route('/cocktail/<cocktail_id>', methods=['DELETE'])
@@ -31,6 +41,18 @@ def delete_single_cocktail(cocktail_id):
     return {'message': 'Deleted cocktail id: {}'.format(result)}
 
 
+@bp.route('/cocktails/delete', methods=['POST'])
+@jwt_required
+def delete_many_cocktails():
+    if request.is_json:
+        data = request.get_json()
+        result = bulk_delete_cocktails(data)
+
+        return {'message': result}
+
+    abort(400, 'Invalid request')
+
+
 @bp.route('/cocktail/<cocktail_id>', methods=['PUT'])
 @jwt_required
 def edit_single_cocktail(cocktail_id):
@@ -38,18 +60,70 @@ def edit_single_cocktail(cocktail_id):
         data = request.get_json()
         result = edit_cocktail(cocktail_id, data)
 
-        return {'message': result.to_dict}
+        return {'message': result.to_dict()}
 
 
 @bp.route('/cocktails')
 def filter_cocktails():
     cocktails, total = find_cocktails(request.args)
 
-    result = [cocktail[0].to_dict for cocktail in cocktails]
+    return {
+        'message': {
+            'cocktails': cocktails,
+            'total': total
+        }
+    }
+
+
+@bp.route('/cocktails/batch', methods=['GET', 'POST'])
+def batch_cocktails():
+    if request.method == 'POST':
+        data = request.get_json() if request.is_json else None
+        if not isinstance(data, dict):
+            abort(400, 'Invalid request')
+        cocktail_ids = data.get('ids')
+    else:
+        cocktail_ids = [i for i in request.args.get('ids', '').split(',')
+                        if i.strip()]
+
+    cocktails, missing = get_cocktails_batch(cocktail_ids, request.args)
 
     return {
         'message': {
-            'cocktails': result,
+            'cocktails': cocktails,
+            'missing': missing
+        }
+    }
+
+
+@bp.route('/cocktails/changes')
+def cocktail_changes():
+    result = get_changes(request.args)
+
+    return {'message': result}
+
+
+@bp.route('/cocktails/changes/stream')
+def cocktail_change_stream():
+    since = get_change_stream_start(request.args,
+                                    request.headers.get('Last-Event-ID'))
+
+    headers = {
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    }
+
+    return Response(stream_with_context(stream_changes(since)),
+                    mimetype='text/event-stream', headers=headers)
+
+
+@bp.route('/cocktails/makeable')
+def makeable_cocktails():
+    cocktails, total = find_makeable_cocktails(request.args)
+
+    return {
+        'message': {
+            'cocktails': cocktails,
             'total': total
         }
     }
@@ -60,3 +134,10 @@ def filters():
     result = get_filters()
 
     return {'message': result}
+
+
+@bp.route('/autocomplete')
+def autocomplete():
+    result = get_suggestions(request.args)
+
+    return {'message': result}
@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+bp = Blueprint('api_menu', __name__)
+
+from server.api_menu import routes
@@ -0,0 +1,81 @@
+import uuid
+
+from flask import abort, current_app
+from sqlalchemy import case, exc, func
+
+from server import db
+from server.models import Cocktail, CocktailIngredients, Ingredient
+
+
+def _servings(items):
+    if not isinstance(items, list) or not items or \
+            len(items) > current_app.config['SHOPPING_LIST_MAX_ITEMS']:
+        abort(400, 'Invalid request')
+
+    servings = {}
+    for item in items:
+        if not isinstance(item, dict):
+            abort(400, 'Invalid request')
+
+        count = item.get('servings', 1)
+        if isinstance(count, bool) or not isinstance(count, int) or \
+                count < 1:
+            abort(400, 'Invalid servings')
+
+        try:
+            cocktail_id = uuid.UUID(str(item.get('id')))
+        except ValueError:
+            abort(400, 'Invalid cocktail id')
+
+        servings[cocktail_id] = servings.get(cocktail_id, 0) + count
+
+    return servings
+
+
+def get_shopping_list(data):
+    """
+    Totals the ingredients needed to make each cocktail the given number
+    of times. Quantities are summed in the database, grouped by
+    ingredient and unit; amounts that cannot be measured ("Top up") are
+    listed with no quantity.
+    """
+    if not isinstance(data, dict):
+        abort(400, 'Invalid request')
+
+    servings = _servings(data.get('items'))
+
+    per_cocktail = case([(CocktailIngredients.cocktail_id == cocktail_id,
+                          count)
+                         for cocktail_id, count in servings.items()],
+                        else_=0)
+    total = func.sum(CocktailIngredients.quantity * per_cocktail)
+
+    try:
+        rows = db.session.query(
+            Ingredient.name, Ingredient.type, CocktailIngredients.unit,
+            total, func.sum(per_cocktail)) \
+            .join(Ingredient,
+                  Ingredient.id == CocktailIngredients.ingredient_id) \
+            .filter(CocktailIngredients.cocktail_id.in_(servings)) \
+            .group_by(Ingredient.name, Ingredient.type,
+                      CocktailIngredients.unit) \
+            .order_by(Ingredient.name, CocktailIngredients.unit) \
+            .all()
+        found = {cocktail_id for (cocktail_id, ) in db.session.query(
+            Cocktail.id).filter(Cocktail.id.in_(servings))}
+    except exc.SQLAlchemyError:
+        abort(500, 'Internal server error')
+
+    ingredients = [{
+        'name': name,
+        'type': ingredient_type,
+        'quantity': round(quantity, 2) if unit is not None else None,
+        'unit': unit,
+        'servings': count
+    } for name, ingredient_type, unit, quantity, count in rows]
+
+    return {
+        'ingredients': ingredients,
+        'missing': [str(cocktail_id) for cocktail_id in servings
+                    if cocktail_id not in found]
+    }
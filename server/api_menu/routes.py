@@ -0,0 +1,12 @@
+from flask import request
+from server.api_menu import bp
+from server.api_menu.controllers import get_shopping_list
+
+
+@bp.route('/menu/shopping-list', methods=['POST'])
+def shopping_list():
+    if request.is_json:
+        data = request.get_json()
+        result = get_shopping_list(data)
+
+        return {'message': result}
@@ -1,11 +1,11 @@
 from flask import abort, current_app
 from sqlalchemy import exc
-from flask_jwt_extended import (create_access_token,
-                                create_refresh_token,
-                                get_jwt_identity,
-                                decode_token)
+from flask_jwt_extended import get_jwt_identity, decode_token
 
-from server.jwt.jwt_util import add_token_to_database, revoke_token
+from server.catalog.cache import catalog_cache
+from server.jwt.jwt_util import (create_token_pair,
+                                 add_claims_to_database,
+                                 revoke_token)
 from server import db
 from server.models import Cocktail, Ingredient, Glassware, Method, User
 
@@ -46,13 +46,17 @@ def login(user_info):
     if not user.check_password(user_info['password']):
         abort(403, 'Invalid credentials')
 
-    access_token = create_access_token(identity=user.id)
-    refresh_token = create_refresh_token(identity=user.id)
+    if user.password_needs_rehash():
+        user.set_password(user_info['password'])
 
-    add_token_to_database(
-        access_token, current_app.config['JWT_IDENTITY_CLAIM'])
-    add_token_to_database(
-        refresh_token, current_app.config['JWT_IDENTITY_CLAIM'])
+    access_token, refresh_token, claims = create_token_pair(str(user.id))
+
+    try:
+        add_claims_to_database(claims,
+                               current_app.config['JWT_IDENTITY_CLAIM'])
+        db.session.commit()
+    except exc.SQLAlchemyError:
+        abort(500, 'Internal server error')
 
     return {
         'access_token': access_token,
@@ -97,3 +101,7 @@ def get_admin_panel_data():
         abort(500, 'Internal server error')
 
     return data
+
+
+def get_cache_stats():
+    return catalog_cache.stats()
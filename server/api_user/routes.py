@@ -4,7 +4,8 @@ from server.api_user import bp
 from server.api_user.controllers import (register_user,
                                          login,
                                          logout,
-                                         get_admin_panel_data)
+                                         get_admin_panel_data,
+                                         get_cache_stats)
 from server.jwt.jwt_util import is_token_revoked
 from server.extensions import jwt
 
@@ -58,3 +59,11 @@ def get_admin_data():
     result = get_admin_panel_data()
 
     return {'message': result}
+
+
+@bp.route('/admin/cache')
+@jwt_required
+def get_cache_data():
+    result = get_cache_stats()
+
+    return {'message': result}
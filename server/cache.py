@@ -0,0 +1,426 @@
+import fcntl
+import glob
+import hashlib
+import heapq
+import os
+import pickle
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+def _group(key):
+    """
+    Returns the group of a key, its first two ':'-separated fields: the
+    namespace name and version of namespaced entries.
+    """
+    return ':'.join(key.split(':', 2)[:2])
+
+
+class MemoryBackend(object):
+    """
+    Per-process LRU store. Every gunicorn worker holds its own copy, so
+    writes are only visible inside the worker that made them.
+    """
+
+    name = 'memory'
+
+    def __init__(self, max_size=4096):
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._counters = {}
+        self.max_size = max_size
+
+    def get(self, key):
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires and expires < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def _store(self, key, value, ttl):
+        self._data[key] = (time.time() + ttl if ttl else None, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_group(self, group):
+        with self._lock:
+            for key in [key for key in self._data if _group(key) == group]:
+                del self._data[key]
+
+    def incr(self, key):
+        # Counters hold namespace versions and are never evicted.
+        with self._lock:
+            value = self._counters[key] = self._counters.get(key, 0) + 1
+            return value
+
+    def update(self, key, fn, ttl=None):
+        with self._lock:
+            entry = self._data.get(key)
+            value = None
+            if entry is not None and not (entry[0] and
+                                          entry[0] < time.time()):
+                value = entry[1]
+            value, result = fn(value)
+            self._store(key, value, ttl)
+            return result
+
+
+class SharedMemoryBackend(object):
+    """
+    Store shared by every process on the host, kept as one pickle file per
+    key in a tmpfs directory (/dev/shm by default), so reads never leave
+    memory. Writes replace files atomically and counters are updated under
+    an flock.
+
+    File names start with a hash of the key's group, so a group is dropped
+    with one glob. The modification time of a file is set to its expiry,
+    which lets a sweep, run by a writer at most every sweep_interval
+    seconds, drop expired files from their stat alone and then the ones
+    expiring soonest until at most max_size are left. Keys without a ttl
+    (namespace versions) are never swept.
+    """
+
+    name = 'shm'
+
+    # Modification time of the files of keys without a ttl.
+    _PERSISTENT = 4102444800.0
+
+    def __init__(self, path, max_size=4096, sweep_interval=60.0):
+        self.path = path
+        self.max_size = max_size
+        self.sweep_interval = sweep_interval
+        self._check_directory()
+        self._lock_path = os.path.join(path, '.lock')
+        self._swept_at = time.monotonic()
+
+    def _check_directory(self):
+        """
+        Files are unpickled, so the directory must only be writable by this
+        user. A directory created by anyone else, or open to other users,
+        is refused.
+        """
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        info = os.lstat(self.path)
+        if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or \
+                info.st_mode & 0o077:
+            raise RuntimeError(f'Cache directory {self.path} must be a '
+                               f'directory owned by uid {os.getuid()} with '
+                               f'mode 0700')
+
+    @staticmethod
+    def _hash(value):
+        return hashlib.sha1(value.encode('utf-8')).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, f'{self._hash(_group(key))[:16]}-'
+                                       f'{self._hash(key)}')
+
+    def get(self, key):
+        try:
+            with open(self._file(key), 'rb') as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+        if expires and expires < time.time():
+            self.delete(key)
+            return None
+
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + ttl if ttl else None
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((expires, value), f, pickle.HIGHEST_PROTOCOL)
+        mtime = expires or self._PERSISTENT
+        os.utime(tmp, (mtime, mtime))
+        os.replace(tmp, self._file(key))
+
+        if time.monotonic() - self._swept_at >= self.sweep_interval:
+            self.sweep()
+
+    def delete(self, key):
+        try:
+            os.unlink(self._file(key))
+        except FileNotFoundError:
+            pass
+
+    def delete_group(self, group):
+        for path in glob.glob(os.path.join(
+                self.path, f'{self._hash(group)[:16]}-*')):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def sweep(self):
+        """
+        Deletes expired files and evicts the ones expiring soonest while
+        more than max_size are left. Returns the number of files deleted.
+        """
+        self._swept_at = time.monotonic()
+        now = time.time()
+        expired = []
+        alive = []
+        count = 0
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if entry.name == '.lock':
+                    continue
+                try:
+                    mtime = entry.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                if entry.name.startswith('.tmp'):
+                    # Left behind by a writer that died before the rename.
+                    if mtime < now - self.sweep_interval:
+                        expired.append(entry.path)
+                    continue
+                count += 1
+                if mtime < now:
+                    expired.append(entry.path)
+                elif mtime != self._PERSISTENT:
+                    alive.append((mtime, entry.path))
+
+        excess = count - len(expired) - self.max_size
+        if excess > 0:
+            expired.extend(path for _, path in heapq.nsmallest(excess, alive))
+
+        for path in expired:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+        return len(expired)
+
+    def incr(self, key):
+        with open(self._lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            value = (self.get(key) or 0) + 1
+            self.set(key, value)
+            return value
+
+    def update(self, key, fn, ttl=None):
+        with open(self._lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            value, result = fn(self.get(key))
+            self.set(key, value, ttl)
+            return result
+
+
+class RedisBackend(object):
+    """
+    Store shared by every process talking to the same Redis-protocol
+    server.
+    """
+
+    name = 'redis'
+
+    def __init__(self, url):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._watch_error = redis.WatchError
+
+    def get(self, key):
+        value = self._client.get(key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self._client.set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                         ex=ttl)
+
+    def delete(self, key):
+        self._client.delete(key)
+
+    def delete_group(self, group):
+        keys = list(self._client.scan_iter(match=f'{group}:*', count=500))
+        for start in range(0, len(keys), 500):
+            self._client.delete(*keys[start:start + 500])
+
+    def incr(self, key):
+        # Counters are read back through get, so they are stored pickled.
+        with self._client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    value = pipe.get(key)
+                    value = (0 if value is None else pickle.loads(value)) + 1
+                    pipe.multi()
+                    pipe.set(key, pickle.dumps(value))
+                    pipe.execute()
+                    return value
+                except self._watch_error:
+                    continue
+
+    def update(self, key, fn, ttl=None):
+        with self._client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    value = pipe.get(key)
+                    value, result = fn(
+                        None if value is None else pickle.loads(value))
+                    pipe.multi()
+                    pipe.set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                             ex=ttl)
+                    pipe.execute()
+                    return result
+                except self._watch_error:
+                    continue
+
+
+class Namespace(object):
+    """
+    Group of cache entries sharing a version number stored in the backend.
+    Bumping the version invalidates every entry of the namespace in every
+    process. Workers poll the version at most once per poll interval and
+    call the registered listeners when another process changed it.
+    """
+
+    def __init__(self, cache, name):
+        self._cache = cache
+        self.name = name
+        self._version = None
+        self._checked_at = 0.0
+        self._listeners = []
+        self.hits = 0
+        self.misses = 0
+
+    def _notify(self):
+        for listener in self._listeners:
+            listener()
+
+    @property
+    def version(self):
+        now = time.monotonic()
+        if (self._version is None or
+                now - self._checked_at >= self._cache.poll_interval):
+            version = self._cache.backend.get(f'{self.name}:version') or 0
+            if self._version is not None and version != self._version:
+                self._notify()
+            self._version = version
+            self._checked_at = now
+
+        return self._version
+
+    def bump(self):
+        previous = self.version
+        self._version = self._cache.backend.incr(f'{self.name}:version')
+        self._checked_at = time.monotonic()
+        if self._version != previous + 1:
+            self._notify()
+        # Whoever moves the version on drops the entries it supersedes.
+        self.clear(self._version - 1)
+
+        return self._version
+
+    def clear(self, version):
+        """
+        Deletes every entry stored under the given version.
+        """
+        self._cache.backend.delete_group(f'{self.name}:{version}')
+
+    def on_change(self, listener):
+        self._listeners.append(listener)
+
+    def _key(self, key, version):
+        return f'{self.name}:{self.version if version is None else version}' \
+               f':{key!r}'
+
+    def get(self, key, version=None):
+        value = self._cache.backend.get(self._key(key, version))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return value
+
+    def set(self, key, value, ttl=None, version=None):
+        self._cache.backend.set(self._key(key, version), value,
+                                ttl or self._cache.default_ttl)
+
+    def delete(self, key, version=None):
+        self._cache.backend.delete(self._key(key, version))
+
+    def stats(self):
+        return {
+            'version': self._version,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+class Cache(object):
+    """
+    Cache with pluggable backends selected by CACHE_BACKEND: "memory"
+    (per process), "shm" (shared by the processes of one host) or "redis"
+    (shared through a Redis-protocol server at CACHE_URL).
+
+    Besides get/set/delete every backend offers incr, delete_group, which
+    drops every key whose first two ':'-separated fields are the group, and
+    update, an atomic read-modify-write: fn receives the current value (or
+    None) and returns the value to store and the result to hand back.
+    """
+
+    def __init__(self):
+        self.backend = MemoryBackend()
+        self.default_ttl = None
+        self.poll_interval = 1.0
+        self._namespaces = {}
+
+    def init_app(self, app):
+        backend = app.config['CACHE_BACKEND']
+
+        if backend == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_URL'])
+        elif backend == 'shm':
+            self.backend = SharedMemoryBackend(
+                app.config['CACHE_SHM_PATH'], app.config['CACHE_MAX_ENTRIES'],
+                app.config['CACHE_SWEEP_INTERVAL'])
+        else:
+            self.backend = MemoryBackend(app.config['CACHE_MAX_ENTRIES'])
+
+        self.default_ttl = app.config['CACHE_DEFAULT_TTL']
+        self.poll_interval = app.config['CACHE_VERSION_POLL_INTERVAL']
+        app.before_request(self.poll)
+
+    def namespace(self, name):
+        namespace = self._namespaces.get(name)
+        if namespace is None:
+            namespace = self._namespaces.setdefault(
+                name, Namespace(self, name))
+
+        return namespace
+
+    def poll(self):
+        for namespace in list(self._namespaces.values()):
+            namespace.version
+
+    def stats(self):
+        return {
+            'backend': self.backend.name,
+            'namespaces': {name: namespace.stats()
+                           for name, namespace in self._namespaces.items()}
+        }
@@ -0,0 +1,214 @@
+import heapq
+import re
+import threading
+
+from flask import current_app
+
+from server import db
+from server.models import Cocktail, CocktailIngredients, Glassware, Ingredient
+
+_WORD_START = re.compile(r'(?:^|(?<=[\s\-/]))\w', re.UNICODE)
+
+
+class _Node(object):
+    __slots__ = ('children', 'terms', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.terms = set()
+        self.top = ()
+
+
+class AutocompleteIndex(object):
+    """
+    Prefix trie over cocktail names, ingredient names, garnishes and
+    glassware. Every node keeps the best suggestions of its subtree, so a
+    lookup only walks the typed prefix. Terms are indexed from the start of
+    every word, e.g. "Old Fashioned" is found by both "old" and "fash".
+
+    A term is a (type, name) pair and its popularity is the number of
+    cocktails it appears in. Cocktail names, which appear once each, are
+    ranked by their view count as of the last build.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built = False
+        self._root = _Node()
+        self._counts = {}
+        self._views = {}
+        self._contributions = {}
+        self._limit = 10
+
+    def _rank(self, term):
+        return (-self._counts.get(term, 0), -self._views.get(term, 0),
+                term[1].lower(), term[0])
+
+    def _refresh(self, path):
+        for node in reversed(path):
+            candidates = set(node.terms)
+            for child in node.children.values():
+                candidates.update(child.top)
+            node.top = tuple(heapq.nsmallest(self._limit, candidates,
+                                             key=self._rank))
+
+    def _paths(self, term, create):
+        key = term[1].lower()
+        for match in _WORD_START.finditer(key):
+            node = self._root
+            path = [node]
+            for char in key[match.start():]:
+                child = node.children.get(char)
+                if child is None:
+                    if not create:
+                        break
+                    child = node.children[char] = _Node()
+                node = child
+                path.append(node)
+            else:
+                yield path
+
+    def _change(self, term, delta):
+        count = self._counts.get(term, 0) + delta
+        if count > 0:
+            self._counts[term] = count
+        else:
+            self._counts.pop(term, None)
+
+        for path in self._paths(term, create=count > 0):
+            if count > 0:
+                path[-1].terms.add(term)
+            else:
+                path[-1].terms.discard(term)
+                for parent, node in zip(reversed(path[:-1]),
+                                        reversed(path[1:])):
+                    if node.terms or node.children:
+                        break
+                    del parent.children[next(
+                        char for char, child in parent.children.items()
+                        if child is node)]
+            self._refresh(path)
+
+    def _set_contribution(self, cocktail_id, terms):
+        old = self._contributions.pop(cocktail_id, ())
+        for term in old:
+            self._change(term, -1)
+        for term in terms:
+            self._change(term, 1)
+        if terms:
+            self._contributions[cocktail_id] = terms
+
+    @staticmethod
+    def _terms(name, garnish, glassware, ingredients):
+        terms = {('cocktail', name)}
+        terms.update(('ingredient', ing) for ing in ingredients)
+        if garnish:
+            terms.add(('garnish', garnish))
+        if glassware:
+            terms.add(('glassware', glassware))
+
+        return frozenset(terms)
+
+    def _ensure_built(self):
+        if self._built:
+            return
+
+        self._limit = current_app.config['AUTOCOMPLETE_LIMIT']
+        ingredients = {}
+        for cocktail_id, name in (
+                db.session.query(CocktailIngredients.cocktail_id,
+                                 Ingredient.name)
+                  .join(Ingredient,
+                        Ingredient.id == CocktailIngredients.ingredient_id)):
+            ingredients.setdefault(cocktail_id, []).append(name)
+
+        counts = {}
+        views = {}
+        contributions = {}
+        for cocktail_id, name, garnish, glassware, cocktail_views in (
+                db.session.query(Cocktail.id, Cocktail.name,
+                                 Cocktail.garnish, Glassware.name,
+                                 Cocktail.views)
+                  .outerjoin(Glassware,
+                             Glassware.id == Cocktail.glassware_id)):
+            terms = self._terms(name, garnish, glassware,
+                                ingredients.get(cocktail_id, ()))
+            views[('cocktail', name)] = max(
+                views.get(('cocktail', name), 0), cocktail_views or 0)
+            contributions[cocktail_id] = terms
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+
+        self._root = _Node()
+        self._counts = counts
+        self._views = views
+        self._contributions = contributions
+        for term in counts:
+            for path in self._paths(term, create=True):
+                path[-1].terms.add(term)
+        self._refresh_all(self._root)
+        self._built = True
+
+    def _refresh_all(self, node):
+        stack = [(node, False)]
+        while stack:
+            node, visited = stack.pop()
+            if visited:
+                self._refresh([node])
+            else:
+                stack.append((node, True))
+                stack.extend((child, False)
+                             for child in node.children.values())
+
+    def warm_up(self):
+        with self._lock:
+            self._ensure_built()
+
+    def invalidate(self):
+        with self._lock:
+            self._built = False
+            self._root = _Node()
+            self._counts = {}
+            self._views = {}
+            self._contributions = {}
+
+    def update(self, cocktail):
+        """
+        Re-indexes the terms of a single cocktail after it was added or
+        edited.
+        """
+        with self._lock:
+            if not self._built:
+                return
+            self._views[('cocktail', cocktail.name)] = cocktail.views or 0
+            self._set_contribution(cocktail.id, self._terms(
+                cocktail.name, cocktail.garnish,
+                cocktail.glassware.name if cocktail.glassware else None,
+                [ci.ingredient.name for ci in cocktail.cocktail_ingredients]))
+
+    def remove(self, cocktail_id):
+        with self._lock:
+            if self._built:
+                self._set_contribution(cocktail_id, ())
+
+    def suggest(self, prefix, limit=None):
+        """
+        Returns up to limit (type, name) suggestions for the given prefix,
+        most popular first.
+        """
+        key = prefix.strip().lower()
+        if not key:
+            return []
+
+        with self._lock:
+            self._ensure_built()
+            node = self._root
+            for char in key:
+                node = node.children.get(char)
+                if node is None:
+                    return []
+
+            return list(node.top[:limit])
+
+
+autocomplete_index = AutocompleteIndex()
@@ -0,0 +1,66 @@
+from sqlalchemy import exists
+
+from server import db
+from server.catalog.cards import card_filters
+from server.catalog.changes import DELETE, record_changes
+from server.catalog.similarity import detach_similarities
+from server.models import (Cocktail, CocktailCard, CocktailIngredients,
+                           Ingredient, Glassware, Method)
+
+
+def select_cocktail_ids(search=None, ingredients=()):
+    """
+    Ids of the cocktails matching a search term and ingredient filter, as
+    served by /cocktails.
+    """
+    return [cocktail_id for (cocktail_id, ) in
+            db.session.query(CocktailCard.cocktail_id).filter(
+                *card_filters(search, ingredients))]
+
+
+def _delete(query):
+    return query.delete(synchronize_session=False)
+
+
+def delete_cocktails(cocktail_ids, collect_garbage=False):
+    """
+    Deletes many cocktails with one set-based statement per table inside a
+    single transaction, and writes their tombstones to the change log. With
+    collect_garbage, ingredients, glassware and methods no cocktail uses
+    anymore are deleted as well.
+
+    Returns the deleted cocktail ids, the ids of the remaining cocktails
+    whose similarity lists lost entries and the number of deleted rows per
+    table. The caller commits.
+    """
+    cocktail_ids = [cocktail_id for (cocktail_id, ) in
+                    db.session.query(Cocktail.id).filter(
+                        Cocktail.id.in_(cocktail_ids))]
+    counts = dict.fromkeys(['cocktails', 'cocktail_ingredients',
+                            'ingredients', 'glassware', 'methods'], 0)
+
+    if not cocktail_ids:
+        return cocktail_ids, [], counts
+
+    neighbour_ids = detach_similarities(cocktail_ids)
+    _delete(db.session.query(CocktailCard).filter(
+        CocktailCard.cocktail_id.in_(cocktail_ids)))
+    counts['cocktail_ingredients'] = _delete(
+        db.session.query(CocktailIngredients).filter(
+            CocktailIngredients.cocktail_id.in_(cocktail_ids)))
+    counts['cocktails'] = _delete(
+        db.session.query(Cocktail).filter(Cocktail.id.in_(cocktail_ids)))
+    record_changes(cocktail_ids, DELETE)
+
+    if collect_garbage:
+        counts['ingredients'] = _delete(
+            db.session.query(Ingredient).filter(~exists().where(
+                CocktailIngredients.ingredient_id == Ingredient.id)))
+        counts['glassware'] = _delete(
+            db.session.query(Glassware).filter(~exists().where(
+                Cocktail.glassware_id == Glassware.id)))
+        counts['methods'] = _delete(
+            db.session.query(Method).filter(~exists().where(
+                Cocktail.method_id == Method.id)))
+
+    return cocktail_ids, neighbour_ids, counts
@@ -0,0 +1,50 @@
+from server.extensions import cache
+
+
+class CatalogCache(object):
+    """
+    Caches of the public catalog reads, stored in the shared cache backend.
+    Query results (ordered cocktail ids and totals) live in the versioned
+    "catalog" namespace, so bumping its version on every write invalidates
+    all of them in every worker. Cocktail documents are cached by id in the
+    "cocktails" namespace, filed under the catalog version they were read
+    at, so a document loaded before a write committed can never be served
+    after it. A bump drops the entries of the version it supersedes.
+    """
+
+    def __init__(self):
+        self.queries = cache.namespace('catalog')
+        self.cocktails = cache.namespace('cocktails')
+
+    @property
+    def version(self):
+        return self.queries.version
+
+    def get_query(self, key):
+        return self.queries.get(key)
+
+    def set_query(self, key, value, version):
+        """
+        Stores a query result computed while the catalog was at the given
+        version, so a result racing with a write is never filed under the
+        newer version.
+        """
+        self.queries.set(key, value, version=version)
+
+    def get_document(self, cocktail_id):
+        return self.cocktails.get(cocktail_id, version=self.version)
+
+    def set_document(self, cocktail_id, document, version):
+        """
+        Stores a document read while the catalog was at the given version.
+        """
+        self.cocktails.set(cocktail_id, document, version=version)
+
+    def bump(self):
+        self.cocktails.clear(self.queries.bump() - 1)
+
+    def stats(self):
+        return cache.stats()
+
+
+catalog_cache = CatalogCache()
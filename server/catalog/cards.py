@@ -0,0 +1,156 @@
+import json
+
+from sqlalchemy import event, type_coerce
+from sqlalchemy.orm import joinedload, selectinload
+
+from server import db
+from server.catalog.changes import UPSERT, record_change
+from server.catalog.sync import references_renamed
+from server.models import (Cocktail, CocktailCard, CocktailIngredients,
+                           Ingredient, Glassware, Method)
+
+
+def card_row(cocktail_id, name, preparation, garnish, method, glassware,
+             img_url, ingredients):
+    """
+    Assembles the denormalized card of a cocktail: the full JSON document
+    served by the API plus the columns used for searching and filtering.
+    ingredients is a list of (name, amount, main) tuples.
+    """
+    names = [ing_name for ing_name, _, _ in ingredients]
+
+    return {
+        'cocktail_id': cocktail_id,
+        'name': name,
+        'img_url': img_url,
+        'search_text': '\n'.join(
+            text for text in [name, preparation, garnish, *names]
+            if text).lower(),
+        'ingredient_names': names,
+        'document': {
+            'id': str(cocktail_id),
+            'name': name,
+            'preparation': preparation,
+            'garnish': garnish,
+            'method': method,
+            'glassware': glassware,
+            'img_url': img_url,
+            'ingredients': [{
+                'name': ing_name,
+                'amount': amount,
+                'main': main
+            } for ing_name, amount, main in ingredients]
+        }
+    }
+
+
+def _card_values(cocktail):
+    return card_row(
+        cocktail.id, cocktail.name, cocktail.preparation, cocktail.garnish,
+        cocktail.method.name if cocktail.method else None,
+        cocktail.glassware.name if cocktail.glassware else None,
+        cocktail.img_url,
+        [(ci.ingredient.name, ci.amount, ci.main)
+         for ci in cocktail.cocktail_ingredients])
+
+
+def card_filters(search=None, ingredients=()):
+    """
+    Criteria on the card table for a lowercase search term and a list of
+    ingredient names that must all be present.
+    """
+    filter_list = []
+
+    if search is not None:
+        filter_list.append(CocktailCard.search_text.contains(search))
+
+    if ingredients and db.session.bind.dialect.name == 'postgresql':
+        filter_list.append(
+            CocktailCard.ingredient_names.contains(list(ingredients)))
+    elif ingredients:
+        # Elsewhere the names are a JSON list; match each quoted name.
+        for name in ingredients:
+            pattern = json.dumps(name).replace('\\', '\\\\') \
+                .replace('%', '\\%').replace('_', '\\_')
+            filter_list.append(
+                type_coerce(CocktailCard.ingredient_names, db.Text)
+                .like(f'%{pattern}%', escape='\\'))
+
+    return filter_list
+
+
+def refresh_card(cocktail):
+    """
+    Rewrites the card of a cocktail inside the caller's transaction, so the
+    read model is committed together with the change to the cocktail.
+    """
+    db.session.flush()
+    db.session.expire(cocktail, ['glassware', 'method'])
+
+    values = _card_values(cocktail)
+    card = cocktail.card or CocktailCard(cocktail=cocktail)
+    for key, value in values.items():
+        setattr(card, key, value)
+    db.session.add(card)
+
+    return card
+
+
+def rebuild_cards(batch_size=500):
+    """
+    Recreates the whole read model from the normalized tables.
+    """
+    db.session.query(CocktailCard).delete(synchronize_session=False)
+
+    cocktail_ids = [cocktail_id for (cocktail_id, ) in
+                    db.session.query(Cocktail.id).order_by(Cocktail.id)]
+
+    for start in range(0, len(cocktail_ids), batch_size):
+        cocktails = (
+            db.session.query(Cocktail)
+              .options(selectinload(Cocktail.cocktail_ingredients)
+                       .joinedload(CocktailIngredients.ingredient),
+                       joinedload(Cocktail.glassware),
+                       joinedload(Cocktail.method))
+              .filter(Cocktail.id.in_(
+                  cocktail_ids[start:start + batch_size]))
+        )
+        db.session.bulk_insert_mappings(
+            CocktailCard, [_card_values(cocktail) for cocktail in cocktails])
+        db.session.expunge_all()
+
+    db.session.commit()
+
+    return len(cocktail_ids)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _refresh_reference_cards(session, flush_context, instances):
+    """
+    Keeps cards and the change log in sync when an ingredient, glassware or
+    method is renamed outside of the cocktail controllers. The caches and
+    indexes are refreshed once the rename is committed.
+    """
+    changed = [obj for obj in session.dirty
+               if isinstance(obj, (Ingredient, Glassware, Method)) and
+               session.is_modified(obj, include_collections=False)]
+
+    with session.no_autoflush:
+        for obj in changed:
+            for cocktail in obj.cocktails:
+                if cocktail.card is not None:
+                    for key, value in _card_values(cocktail).items():
+                        setattr(cocktail.card, key, value)
+                    record_change(cocktail.id, UPSERT)
+                    session.info['references_renamed'] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def _propagate_renames(session):
+    if session.info.pop('references_renamed', False):
+        references_renamed()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_renames(session):
+    session.info.pop('references_renamed', None)
@@ -0,0 +1,130 @@
+import json
+import time
+
+from flask import current_app
+from sqlalchemy import func
+
+from server import db
+from server.models import CatalogChange, CocktailCard
+
+UPSERT = 'upsert'
+DELETE = 'delete'
+
+
+def _lock_log():
+    """
+    Sequence numbers are taken when a row is inserted but become visible on
+    commit, so two concurrent writers could commit out of order and a reader
+    polling in between would skip the lower number for good. On Postgres
+    the writers are serialized on the log table until they commit; readers
+    are not blocked.
+    """
+    if db.session.bind.dialect.name == 'postgresql':
+        db.session.execute('LOCK TABLE catalog_change IN EXCLUSIVE MODE')
+
+
+def record_change(cocktail_id, operation):
+    """
+    Appends a change of a cocktail to the change log inside the caller's
+    transaction.
+    """
+    _lock_log()
+    db.session.add(CatalogChange(cocktail_id=cocktail_id,
+                                 operation=operation))
+
+
+def record_changes(cocktail_ids, operation):
+    """
+    Appends the same change of many cocktails with one executemany insert.
+    """
+    _lock_log()
+    db.session.execute(CatalogChange.__table__.insert(), [{
+        'cocktail_id': cocktail_id,
+        'operation': operation
+    } for cocktail_id in cocktail_ids])
+
+
+def latest_seq():
+    """
+    Returns the sequence number of the latest committed change, a catalog
+    version that survives restarts and cache flushes.
+    """
+    return db.session.query(func.max(CatalogChange.seq)).scalar() or 0
+
+
+def changes_since(since, limit):
+    """
+    Returns the changes after sequence number since, compacted to the latest
+    change of every cocktail, in sequence order: upserts carry the current
+    cocktail document and tombstones only the id. Also returns the sequence
+    number to resume from and whether more changes are waiting.
+    """
+    latest = (
+        db.session.query(func.max(CatalogChange.seq).label('seq'))
+          .filter(CatalogChange.seq > since)
+          .group_by(CatalogChange.cocktail_id)
+          .subquery()
+    )
+
+    rows = (
+        db.session.query(CatalogChange.seq, CatalogChange.cocktail_id,
+                         CatalogChange.operation, CocktailCard.document)
+          .join(latest, latest.c.seq == CatalogChange.seq)
+          .outerjoin(CocktailCard,
+                     CocktailCard.cocktail_id == CatalogChange.cocktail_id)
+          .order_by(CatalogChange.seq)
+          .limit(limit + 1)
+          .all()
+    )
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    changes = []
+    for seq, cocktail_id, operation, document in rows:
+        if operation == UPSERT and document is not None:
+            changes.append({
+                'seq': seq,
+                'op': UPSERT,
+                'id': str(cocktail_id),
+                'cocktail': document
+            })
+        else:
+            changes.append({
+                'seq': seq,
+                'op': DELETE,
+                'id': str(cocktail_id)
+            })
+
+    return changes, rows[-1].seq if rows else since, more
+
+
+def stream_changes(since):
+    """
+    Server-Sent Events generator. Polls the change log every
+    CHANGE_STREAM_POLL_INTERVAL seconds and closes the stream after
+    CHANGE_STREAM_TIMEOUT seconds so a client never holds a worker for long;
+    EventSource clients reconnect on their own and resume from the
+    Last-Event-ID header.
+    """
+    limit = current_app.config['CHANGES_PAGE_SIZE']
+    interval = current_app.config['CHANGE_STREAM_POLL_INTERVAL']
+    deadline = time.monotonic() + current_app.config['CHANGE_STREAM_TIMEOUT']
+
+    yield f'retry: {int(interval * 1000)}\n\n'
+
+    while True:
+        changes, since, more = changes_since(since, limit)
+        # Give the connection back to the pool between polls.
+        db.session.close()
+
+        for change in changes:
+            yield f'id: {change["seq"]}\nevent: {change["op"]}\n' \
+                  f'data: {json.dumps(change, separators=(",", ":"))}\n\n'
+        if not changes:
+            yield ': keep-alive\n\n'
+
+        if time.monotonic() >= deadline:
+            return
+        if not more:
+            time.sleep(interval)
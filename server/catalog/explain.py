@@ -0,0 +1,140 @@
+import uuid
+from contextlib import contextmanager
+
+from flask import current_app
+from sqlalchemy import event
+
+from server import db
+from server.cache import MemoryBackend
+from server.catalog.similarity import _neighbour_vectors
+from server.extensions import cache
+from server.jwt.jwt_util import is_token_revoked
+from server.models import Cocktail, Ingredient
+
+
+@contextmanager
+def _capture_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute',
+                     before_cursor_execute)
+
+
+@contextmanager
+def _uncached():
+    """
+    Sends every read to the database: the cache keeps nothing, the
+    snapshot is not used and admission control is off.
+    """
+    config = current_app.config
+    saved = {key: config[key] for key in ('CATALOG_SNAPSHOT_PATH',
+                                          'ADMISSION_ENABLED')}
+    backend = cache.backend
+    config.update(CATALOG_SNAPSHOT_PATH=None, ADMISSION_ENABLED=False)
+    cache.backend = MemoryBackend(max_size=0)
+    try:
+        yield
+    finally:
+        cache.backend = backend
+        config.update(saved)
+
+
+def _walk(plan, parent=None):
+    yield plan, parent
+    for child in plan.get('Plans', []):
+        yield from _walk(child, plan)
+
+
+def _hot_queries():
+    """
+    Scenarios exercising the queries behind the public endpoints and the
+    lookups done on every write, using sample values from the catalog.
+    """
+    client = current_app.test_client()
+    cocktail_id, name = db.session.query(Cocktail.id, Cocktail.name) \
+        .order_by(Cocktail.name).first()
+    spirit = db.session.query(Ingredient.name) \
+        .filter(Ingredient.type == 'Spirit').order_by(Ingredient.name) \
+        .first()[0]
+    search = name.split()[-1].lower()
+
+    return [
+        ('get_cocktail', lambda: client.get(f'/cocktail/{cocktail_id}')),
+        ('find_cocktails', lambda: client.get('/cocktails')),
+        ('find_cocktails search',
+         lambda: client.get(f'/cocktails?search={search}')),
+        ('find_cocktails filter',
+         lambda: client.get(f'/cocktails?spirit={spirit}')),
+        ('find_cocktails search and filter',
+         lambda: client.get(f'/cocktails?search={search}&spirit={spirit}')),
+        ('get_filters', lambda: client.get('/filters')),
+        ('get_similar_cocktails',
+         lambda: client.get(f'/cocktail/{cocktail_id}/similar')),
+        ('duplicate cocktail check',
+         lambda: Cocktail.query.filter(Cocktail.name == name).first()),
+        ('ingredient neighbours', lambda: _neighbour_vectors(cocktail_id)),
+        ('is_token_revoked',
+         lambda: is_token_revoked({'jti': str(uuid.uuid4())})),
+    ]
+
+
+def explain_hot_queries(min_rows=1000):
+    """
+    Runs EXPLAIN (FORMAT JSON) for every statement issued by the hot
+    queries and reports sequential scans on tables with at least min_rows
+    rows. Unfiltered scans feeding an aggregate, i.e. total counts of a
+    whole table, are expected and not reported.
+
+    Caches and the snapshot are bypassed while the scenarios run. A
+    scenario that issues no SQL or fails is reported with statement None,
+    since it would otherwise pass without checking anything.
+
+    Returns a list of (scenario, statement, violations) tuples.
+    """
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT relname, reltuples FROM pg_class "
+                       "WHERE relkind = 'r' AND reltuples >= %s",
+                       (min_rows, ))
+        large_tables = {relname for relname, _ in cursor.fetchall()}
+
+        report = []
+        for scenario, run in _hot_queries():
+            with _uncached(), _capture_statements() as statements:
+                result = run()
+
+            status = getattr(result, 'status_code', 200)
+            if status >= 400:
+                report.append((scenario, None, [f'returned HTTP {status}']))
+                continue
+            if not statements:
+                report.append((scenario, None, ['issued no SQL']))
+                continue
+
+            for statement, parameters in statements:
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + statement,
+                               parameters)
+                plan = cursor.fetchone()[0][0]['Plan']
+                violations = [
+                    node['Relation Name'] for node, parent in _walk(plan)
+                    if node['Node Type'] == 'Seq Scan' and
+                    node['Relation Name'] in large_tables and
+                    not ('Filter' not in node and parent is not None and
+                         parent['Node Type'] == 'Aggregate')
+                ]
+                report.append((scenario, statement, violations))
+        connection.rollback()
+    finally:
+        connection.close()
+
+    return report
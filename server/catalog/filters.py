@@ -0,0 +1,45 @@
+def group_filters(result):
+    """
+    Groups (name, type) ingredient rows, ordered by name, into the filter
+    sections served by /filters.
+    """
+    filters = [
+        {
+            'name': 'Spirit',
+            'label': 'spirit',
+            'value': []
+        },
+        {
+            'name': 'Liqueur',
+            'label': 'liqueur',
+            'value': []
+        },
+        {
+            'name': 'Wine/Vermouth',
+            'label': 'wine',
+            'value': []
+        },
+        {
+            'name': 'Mixer',
+            'label': 'mixer',
+            'value': []
+        }
+    ]
+
+    ingredients = [
+        {
+            'name': name,
+            'type': ing_type
+        } for name, ing_type in result]
+
+    for ing in ingredients:
+        if ing['type'] == 'Spirit':
+            filters[0]['value'].append(ing['name'])
+        elif ing['type'] == 'Liqueur':
+            filters[1]['value'].append(ing['name'])
+        elif ing['type'] == 'Mixer':
+            filters[3]['value'].append(ing['name'])
+        else:
+            filters[2]['value'].append(ing['name'])
+
+    return filters
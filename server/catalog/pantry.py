@@ -0,0 +1,249 @@
+import bisect
+import heapq
+import threading
+from collections import Counter
+from itertools import chain, islice
+
+from server import db
+from server.models import Cocktail, CocktailIngredients, Ingredient
+
+# Largest number of missing ingredients a lookup may allow.
+MAX_MISSING = 2
+
+_EMPTY = frozenset()
+
+
+class PantryIndex(object):
+    """
+    In-memory index of the ingredient set of every cocktail. Answers "what
+    can I make with these ingredients" without touching the database.
+
+    Each cocktail has two recipes: the full one and the one without
+    garnish-type mixers (mixers that are not a main ingredient, e.g.
+    bitters, syrups or soda toppings). For both there are postings from
+    every ingredient to the cocktails using it, so a lookup only counts
+    pantry hits of the cocktails sharing an ingredient with the pantry.
+    Recipes of at most MAX_MISSING ingredients match without sharing any
+    and are kept apart, sorted by name.
+
+    Cocktails are numbered with dense slots, which hash much faster than
+    UUIDs. Postings and small recipe lists are replaced, never changed in
+    place, on every write, so lookups run outside the lock on whatever they
+    read at the start.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built = False
+        self._reset()
+
+    def _reset(self):
+        self._positions = {}
+        self._names = []
+        # cocktail id -> slot, slot -> (id, name, full mask, core mask)
+        self._slots = {}
+        self._cocktails = []
+        # slot -> number of ingredients of the full and the core recipe
+        self._sizes = ([], [])
+        self._postings = ({}, {})
+        # size -> (name, slot) of the recipes of at most MAX_MISSING
+        self._small = ({}, {})
+
+    def _position(self, name):
+        key = name.lower()
+        position = self._positions.get(key)
+        if position is None:
+            position = len(self._names)
+            self._positions[key] = position
+            self._names.append(name)
+        return position
+
+    @staticmethod
+    def _bits(mask):
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def _index(self, slot, masks, add):
+        for index, mask in enumerate(masks):
+            postings = self._postings[index]
+            small = self._small[index]
+            for position in self._bits(mask):
+                ids = postings.get(position, _EMPTY)
+                postings[position] = ids | {slot} if add else ids - {slot}
+            size = bin(mask).count('1')
+            if size <= MAX_MISSING:
+                ordered = list(small.get(size, ()))
+                key = (self._cocktails[slot][1], slot)
+                if add:
+                    bisect.insort(ordered, key)
+                else:
+                    ordered.remove(key)
+                small[size] = ordered
+
+    def _add(self, cocktail_id, name, ingredients):
+        full_mask = 0
+        core_mask = 0
+        for ing_name, ing_type, main in ingredients:
+            bit = 1 << self._position(ing_name)
+            full_mask |= bit
+            if main or ing_type != 'Mixer':
+                core_mask |= bit
+
+        slot = self._slots[cocktail_id] = len(self._cocktails)
+        self._cocktails.append((cocktail_id, name, full_mask, core_mask))
+        for sizes, mask in zip(self._sizes, (full_mask, core_mask)):
+            sizes.append(bin(mask).count('1'))
+        self._index(slot, (full_mask, core_mask), add=True)
+
+    def _remove(self, cocktail_id):
+        slot = self._slots.pop(cocktail_id, None)
+        if slot is not None:
+            self._index(slot, self._cocktails[slot][2:], add=False)
+            self._cocktails[slot] = None
+
+    def _ensure_built(self):
+        if self._built:
+            return
+
+        rows = (
+            db.session.query(Cocktail.id, Cocktail.name, Ingredient.name,
+                             Ingredient.type, CocktailIngredients.main)
+              .join(CocktailIngredients,
+                    CocktailIngredients.cocktail_id == Cocktail.id)
+              .join(Ingredient,
+                    Ingredient.id == CocktailIngredients.ingredient_id)
+              .all()
+        )
+
+        recipes = {}
+        for cocktail_id, name, ing_name, ing_type, main in rows:
+            recipes.setdefault((cocktail_id, name), []).append(
+                (ing_name, ing_type, main))
+
+        # Postings are built as plain sets and frozen once.
+        self._reset()
+        postings = ({}, {})
+        small = ({}, {})
+        for (cocktail_id, name), ingredients in recipes.items():
+            full_mask = 0
+            core_mask = 0
+            for ing_name, ing_type, main in ingredients:
+                bit = 1 << self._position(ing_name)
+                full_mask |= bit
+                if main or ing_type != 'Mixer':
+                    core_mask |= bit
+            slot = self._slots[cocktail_id] = len(self._cocktails)
+            self._cocktails.append((cocktail_id, name, full_mask, core_mask))
+            for index, mask in enumerate((full_mask, core_mask)):
+                for position in self._bits(mask):
+                    postings[index].setdefault(position, set()).add(slot)
+                size = bin(mask).count('1')
+                self._sizes[index].append(size)
+                if size <= MAX_MISSING:
+                    small[index].setdefault(size, []).append((name, slot))
+
+        for index in range(2):
+            self._postings[index].update(
+                (position, frozenset(slots))
+                for position, slots in postings[index].items())
+            self._small[index].update(
+                (size, sorted(recipes))
+                for size, recipes in small[index].items())
+        self._built = True
+
+    def warm_up(self):
+        with self._lock:
+            self._ensure_built()
+
+    def invalidate(self):
+        with self._lock:
+            self._built = False
+            self._reset()
+
+    def update(self, cocktail):
+        """
+        Re-indexes a single cocktail after it was added or edited.
+        """
+        with self._lock:
+            if not self._built:
+                return
+            self._remove(cocktail.id)
+            self._add(cocktail.id, cocktail.name, [
+                (ci.ingredient.name, ci.ingredient.type, ci.main)
+                for ci in cocktail.cocktail_ingredients])
+
+    def remove(self, cocktail_id):
+        with self._lock:
+            if self._built:
+                self._remove(cocktail_id)
+
+    def match(self, pantry, max_missing=0, ignore_garnish=False,
+              start=0, stop=None):
+        """
+        Returns the total number of cocktails missing at most max_missing
+        ingredients from the pantry and the (cocktail_id, missing ingredient
+        names, sorted alphabetically) pairs of the requested slice, ranked by
+        the number of missing ingredients and then by name.
+        """
+        with self._lock:
+            self._ensure_built()
+            cocktails = self._cocktails
+            names = self._names
+            index = 1 if ignore_garnish else 0
+            postings = self._postings[index]
+            sizes = self._sizes[index]
+            positions = {self._positions.get(name.strip().lower())
+                         for name in pantry} - {None}
+            lists = [postings.get(position, _EMPTY)
+                     for position in positions]
+            buckets = [self._small[index].get(size, ())
+                       for size in range(max_missing + 1)]
+
+        have = 0
+        for position in positions:
+            have |= 1 << position
+
+        hits = Counter()
+        for slots in lists:
+            hits.update(slots)
+
+        # Cocktails sharing an ingredient, by number of missing ones.
+        mask_index = index + 2
+        by_missing = [[] for _ in range(max_missing + 1)]
+        for slot in [slot for slot, count in hits.items()
+                     if sizes[slot] - count <= max_missing]:
+            entry = cocktails[slot]
+            if entry is not None:
+                by_missing[sizes[slot] - hits[slot]].append((entry[1], slot))
+
+        total = 0
+        ranked = []
+        for missing, matches in enumerate(by_missing):
+            # Small recipes that share nothing miss all of their ingredients.
+            unshared = [match for match in buckets[missing]
+                        if match[1] not in hits]
+            total += len(matches) + len(unshared)
+            # Only the requested slice has to be ranked.
+            matches = sorted(matches) if stop is None \
+                else heapq.nsmallest(stop, matches)
+            ranked.append(heapq.merge(matches, unshared))
+
+        result = []
+        for _, slot in islice(chain.from_iterable(ranked), start, stop):
+            entry = cocktails[slot]
+            if entry is None:
+                continue
+            missing = entry[mask_index] & ~have
+            # Bit positions follow insertion order, which changes between
+            # builds; names keep the answer stable.
+            result.append((entry[0],
+                           sorted((names[position]
+                                   for position in self._bits(missing)),
+                                  key=str.lower)))
+
+        return total, result
+
+
+pantry_index = PantryIndex()
@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import bindparam, exc, text
+
+from server import db
+from server.models import Cocktail
+
+logger = logging.getLogger(__name__)
+
+
+class PopularityCounter(object):
+    """
+    Counts cocktail views and search hits in memory and adds them to the
+    cocktail rows in one batched statement. A flush happens on the first
+    count after POPULARITY_FLUSH_INTERVAL seconds or once
+    POPULARITY_FLUSH_MAX counts are pending, so a crashed worker loses at
+    most that much. Counts that fail to flush are kept for the next try.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._total = 0
+        self._flushing = False
+        self._flushed_at = time.monotonic()
+
+    def _add(self, counts):
+        with self._lock:
+            for cocktail_id, (views, hits) in counts.items():
+                pending = self._pending.setdefault(cocktail_id, [0, 0])
+                pending[0] += views
+                pending[1] += hits
+                self._total += views + hits
+
+    def _due(self):
+        return not self._flushing and self._pending and (
+            self._total >= current_app.config['POPULARITY_FLUSH_MAX'] or
+            time.monotonic() - self._flushed_at >=
+            current_app.config['POPULARITY_FLUSH_INTERVAL'])
+
+    def record_view(self, cocktail_id):
+        self._add({cocktail_id: (1, 0)})
+        self.flush_if_due()
+
+    def record_hits(self, cocktail_ids):
+        self._add({cocktail_id: (0, 1) for cocktail_id in cocktail_ids})
+        self.flush_if_due()
+
+    def flush_if_due(self):
+        if self._due():
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the pending counts and returns the number of cocktails
+        updated. Runs on its own connection, outside the request's
+        transaction.
+        """
+        with self._lock:
+            if self._flushing or not self._pending:
+                return 0
+            pending, self._pending, self._total = self._pending, {}, 0
+            self._flushing = True
+
+        # Rows are always updated in id order so concurrent flushes from
+        # other workers cannot deadlock.
+        rows = [(cocktail_id, views, hits) for cocktail_id, (views, hits)
+                in sorted(pending.items())]
+        try:
+            with db.engine.begin() as connection:
+                _write_counts(connection, rows)
+        except exc.SQLAlchemyError as e:
+            logger.warning('Could not flush popularity counts: %s', e)
+            self._add(pending)
+            rows = []
+        finally:
+            with self._lock:
+                self._flushing = False
+                self._flushed_at = time.monotonic()
+
+        return len(rows)
+
+
+def _write_counts(connection, rows, batch_size=500):
+    if connection.dialect.name != 'postgresql':
+        table = Cocktail.__table__
+        connection.execute(
+            table.update()
+                 .where(table.c.id == bindparam('_id'))
+                 .values(views=table.c.views + bindparam('_views'),
+                         search_hits=table.c.search_hits +
+                         bindparam('_hits')),
+            [{'_id': cocktail_id, '_views': views, '_hits': hits}
+             for cocktail_id, views, hits in rows])
+        return
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        params = {}
+        values = []
+        for i, (cocktail_id, views, hits) in enumerate(batch):
+            values.append(f'(CAST(:id{i} AS uuid), :views{i}, :hits{i})')
+            params.update({f'id{i}': str(cocktail_id), f'views{i}': views,
+                           f'hits{i}': hits})
+        connection.execute(text(
+            'UPDATE cocktail '
+            'SET views = cocktail.views + counts.views, '
+            'search_hits = cocktail.search_hits + counts.hits '
+            f'FROM (VALUES {", ".join(values)}) '
+            'AS counts (id, views, hits) '
+            'WHERE cocktail.id = counts.id'), params)
+
+
+popularity_counter = PopularityCounter()
@@ -0,0 +1,116 @@
+import re
+from fractions import Fraction
+
+# Volume units and their size in millilitres. Everything measured by
+# volume is normalized to ml so amounts from different recipes add up.
+VOLUMES = {
+    'ml': 1.0,
+    'cl': 10.0,
+    'dl': 100.0,
+    'l': 1000.0,
+    'oz': 29.5735,
+    'shot': 44.0,
+    'tsp': 4.93,
+    'tbsp': 14.79,
+    'barspoon': 5.0,
+    'cup': 236.59,
+    'dash': 0.92,
+    'drop': 0.05,
+    'splash': 5.0,
+}
+
+# Counted units, kept as they are.
+COUNTS = {'piece', 'slice', 'wedge', 'leaf', 'sprig', 'cube', 'pinch',
+          'twist', 'peel', 'whole'}
+
+ALIASES = {
+    'milliliter': 'ml', 'millilitre': 'ml', 'centiliter': 'cl',
+    'centilitre': 'cl', 'liter': 'l', 'litre': 'l', 'ounce': 'oz',
+    'fl oz': 'oz', 'teaspoon': 'tsp', 'tablespoon': 'tbsp',
+    'bar spoon': 'barspoon', 'leave': 'leaf', 'leaves': 'leaf',
+    'dashes': 'dash', 'pinches': 'pinch', 'splashes': 'splash',
+}
+
+# Size of cocktail_ingredients.unit.
+MAX_UNIT_LENGTH = 20
+
+UNICODE_FRACTIONS = {'½': ' 1/2', '⅓': ' 1/3', '⅔': ' 2/3', '¼': ' 1/4',
+                     '¾': ' 3/4', '⅛': ' 1/8'}
+
+_NUMBER = r'\d+(?:[.,]\d+)?(?:\s+\d+/\d+)?|\d+/\d+'
+_AMOUNT = re.compile(
+    rf'^\s*(?P<number>{_NUMBER})(?:\s*(?:-|to)\s*(?:{_NUMBER}))?'
+    rf'\s*(?P<unit>[a-z][a-z ]*?)?\.?\s*$')
+
+
+def _number(text):
+    return float(sum(Fraction(part.replace(',', '.'))
+                     for part in text.split()))
+
+
+def _known(text):
+    for candidate in (text, text[:-1] if text.endswith('s') else text):
+        candidate = ALIASES.get(candidate, candidate)
+        if candidate in VOLUMES or candidate in COUNTS:
+            return candidate
+
+    return None
+
+
+def _singular(noun):
+    for suffix, replacement in (('ies', 'y'), ('ches', 'ch'),
+                                ('shes', 'sh'), ('xes', 'x')):
+        if noun.endswith(suffix):
+            return noun[:-len(suffix)] + replacement
+
+    return noun[:-1] if noun.endswith('s') and not noun.endswith('ss') \
+        else noun
+
+
+def _unit(text):
+    if not text:
+        return 'piece'
+
+    # "4 oz soda" is measured in oz, "6 mint leaves" in leaves.
+    words = text.split()
+    for end in range(len(words), 0, -1):
+        unit = _known(' '.join(words[:end]))
+        if unit is not None:
+            return unit
+    unit = _known(words[-1])
+    if unit is not None:
+        return unit
+
+    # Anything else is counted in its own noun: "1/2 lemon", "2 eggs".
+    noun = ' '.join(words[:-1] + [_singular(words[-1])])
+    return noun if len(noun) <= MAX_UNIT_LENGTH else None
+
+
+def parse_amount(amount):
+    """
+    Parses a free-form amount such as "1 1/2 oz", "30 ml", "2 dashes" or
+    "¾ oz" into (quantity, unit). Volumes are converted to ml, counted
+    units are kept and any other noun ("1/2 lemon") is counted as a unit of
+    its own, ranges use their lower bound. Returns (None, None) for amounts
+    that cannot be measured, e.g. "Top up".
+    """
+    if not amount:
+        return None, None
+
+    text = re.sub(r'^\s*an?\s+', '1 ', amount.lower())
+    for char, fraction in UNICODE_FRACTIONS.items():
+        text = text.replace(char, fraction)
+
+    match = _AMOUNT.match(text)
+    if match is None:
+        return None, None
+
+    unit = _unit((match.group('unit') or '').strip())
+    if unit is None:
+        return None, None
+
+    quantity = _number(match.group('number'))
+    if unit in VOLUMES:
+        return round(quantity * VOLUMES[unit], 2), 'ml'
+
+    return quantity, unit
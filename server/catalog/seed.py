@@ -0,0 +1,107 @@
+import random
+import uuid
+
+from server import db
+from server.catalog.cards import card_row
+from server.catalog.changes import UPSERT
+from server.catalog.quantities import parse_amount
+from server.catalog.similarity import rebuild_similarities
+from server.models import (CatalogChange, Cocktail, CocktailCard,
+                           CocktailIngredients, Ingredient, Glassware,
+                           Method)
+
+INGREDIENT_TYPES = ['Spirit', 'Liqueur', 'Wine/Vermouth', 'Mixer']
+AMOUNTS = ['1/2 oz', '3/4 oz', '1 oz', '1 1/2 oz', '2 oz', '2 dashes',
+           '1 barspoon', 'Top up']
+WORDS = ['stir', 'shake', 'strain', 'chilled', 'glass', 'ice', 'garnish',
+         'express', 'double', 'fine', 'build', 'top', 'muddle', 'gently']
+
+
+def _uuid(rng):
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _insert(model, rows, batch_size=5000):
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(model.__table__.insert(),
+                           rows[start:start + batch_size])
+
+
+def seed_catalog(cocktails=1000, ingredients=200, seed=0, similar=False):
+    """
+    Fills the catalog with synthetic cocktails for benchmarks, query plan
+    checks and tests. Rows, cards included, are generated in memory and
+    written with executemany inserts, so large catalogs are seeded in
+    seconds and small ones in milliseconds.
+    """
+    rng = random.Random(seed)
+
+    glassware = [{'id': _uuid(rng), 'name': f'Seed Glass {i}'}
+                 for i in range(12)]
+    methods = [{'id': _uuid(rng), 'name': f'Seed Method {i}'}
+               for i in range(6)]
+    ingredient_rows = [{
+        'id': _uuid(rng),
+        'name': f'Seed Ingredient {i:05d}',
+        'type': rng.choice(INGREDIENT_TYPES)
+    } for i in range(ingredients)]
+
+    cocktail_rows = []
+    association_rows = []
+    card_rows = []
+    for i in range(cocktails):
+        cocktail = {
+            'id': _uuid(rng),
+            'name': f'Seed Cocktail {i:06d}',
+            'preparation': ' '.join(rng.choice(WORDS) for _ in range(12)),
+            'garnish': rng.choice(['Lemon twist', 'Orange peel', 'Cherry',
+                                   'Mint sprig', None]),
+            'img_url': ''
+        }
+        glass = rng.choice(glassware)
+        method = rng.choice(methods)
+        cocktail.update(glassware_id=glass['id'], method_id=method['id'])
+        cocktail_rows.append(cocktail)
+
+        recipe = []
+        for position, ingredient in enumerate(
+                rng.sample(ingredient_rows, rng.randint(2, 6))):
+            association = {
+                'id': _uuid(rng),
+                'cocktail_id': cocktail['id'],
+                'ingredient_id': ingredient['id'],
+                'amount': rng.choice(AMOUNTS),
+                'main': position < 2
+            }
+            association['quantity'], association['unit'] = parse_amount(
+                association['amount'])
+            association_rows.append(association)
+            recipe.append((ingredient['name'], association['amount'],
+                           association['main']))
+
+        card_rows.append(card_row(
+            cocktail['id'], cocktail['name'], cocktail['preparation'],
+            cocktail['garnish'], method['name'], glass['name'],
+            cocktail['img_url'], recipe))
+
+    _insert(Glassware, glassware)
+    _insert(Method, methods)
+    _insert(Ingredient, ingredient_rows)
+    _insert(Cocktail, cocktail_rows)
+    _insert(CocktailIngredients, association_rows)
+    _insert(CocktailCard, card_rows)
+    _insert(CatalogChange, [{
+        'cocktail_id': row['id'],
+        'operation': UPSERT
+    } for row in cocktail_rows])
+    db.session.commit()
+
+    if similar:
+        rebuild_similarities()
+
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.connect() as connection:
+            connection.execution_options(
+                isolation_level='AUTOCOMMIT').execute('ANALYZE')
+
+    return len(cocktail_rows), len(association_rows)
@@ -0,0 +1,293 @@
+import heapq
+import logging
+import math
+import queue
+import threading
+
+from flask import current_app
+from sqlalchemy import exc
+
+from server import db
+from server.models import CocktailIngredients, CocktailSimilarity
+
+logger = logging.getLogger(__name__)
+
+
+def _ingredient_vectors(rows, main_weight):
+    """
+    Turns (cocktail_id, ingredient_id, main) rows into the sparse cocktail x
+    ingredient matrix {cocktail_id: {ingredient_id: weight}}. Main
+    ingredients are weighted by main_weight.
+    """
+    vectors = {}
+    for cocktail_id, ingredient_id, main in rows:
+        vectors.setdefault(cocktail_id, {})[ingredient_id] = (
+            main_weight if main else 1.0)
+
+    return vectors
+
+
+def _load_vectors(*criteria):
+    """
+    Loads the matrix of every cocktail, or of the rows matching the given
+    criteria.
+    """
+    rows = db.session.query(CocktailIngredients.cocktail_id,
+                            CocktailIngredients.ingredient_id,
+                            CocktailIngredients.main).filter(*criteria)
+
+    return _ingredient_vectors(
+        rows, current_app.config['MAIN_INGREDIENT_WEIGHT'])
+
+
+def _postings(vectors):
+    postings = {}
+    for cocktail_id, vector in vectors.items():
+        for ingredient_id, weight in vector.items():
+            postings.setdefault(ingredient_id, []).append(
+                (cocktail_id, weight))
+
+    return postings
+
+
+def _norm(vector):
+    return math.sqrt(sum(w * w for w in vector.values()))
+
+
+def _cosine(vector, other):
+    dot = sum(w * other[i] for i, w in vector.items() if i in other)
+    if not dot:
+        return 0.0
+
+    return dot / (_norm(vector) * _norm(other))
+
+
+def _top_k(cocktail_id, vectors, postings, norms, k):
+    """
+    Computes one row of the sparse matrix product M x M^T through the
+    ingredient postings, normalizes it to cosine similarity and keeps the
+    k best entries as (score, similar_id) pairs.
+    """
+    vector = vectors.get(cocktail_id)
+    if not vector:
+        return []
+
+    dots = {}
+    for ingredient_id, weight in vector.items():
+        for other_id, other_weight in postings[ingredient_id]:
+            if other_id != cocktail_id:
+                dots[other_id] = dots.get(other_id, 0.0) + (
+                    weight * other_weight)
+
+    norm = norms[cocktail_id]
+    return heapq.nlargest(k, ((dot / (norm * norms[other_id]), other_id)
+                              for other_id, dot in dots.items()))
+
+
+def _to_rows(cocktail_id, top):
+    return [{
+        'cocktail_id': cocktail_id,
+        'similar_id': similar_id,
+        'rank': rank,
+        'score': score
+    } for rank, (score, similar_id) in enumerate(top)]
+
+
+def _neighbour_vectors(cocktail_id):
+    """
+    Loads the full vectors of a cocktail and of every cocktail sharing at
+    least one ingredient with it.
+    """
+    ingredient_ids = db.session.query(CocktailIngredients.ingredient_id) \
+        .filter(CocktailIngredients.cocktail_id == cocktail_id)
+    neighbour_ids = db.session.query(CocktailIngredients.cocktail_id) \
+        .filter(CocktailIngredients.ingredient_id.in_(ingredient_ids))
+
+    return _load_vectors(CocktailIngredients.cocktail_id.in_(neighbour_ids))
+
+
+def _replace_rows(rows_by_cocktail):
+    if not rows_by_cocktail:
+        return
+
+    db.session.query(CocktailSimilarity).filter(
+        CocktailSimilarity.cocktail_id.in_(list(rows_by_cocktail))).delete(
+        synchronize_session=False)
+    db.session.bulk_insert_mappings(
+        CocktailSimilarity,
+        [row for rows in rows_by_cocktail.values() for row in rows])
+
+
+def _similarity_rows(vectors, k):
+    """
+    Yields the top-k similarity rows of every cocktail of the matrix.
+    """
+    postings = _postings(vectors)
+    norms = {cocktail_id: _norm(vector)
+             for cocktail_id, vector in vectors.items()}
+
+    for cocktail_id in vectors:
+        yield from _to_rows(
+            cocktail_id, _top_k(cocktail_id, vectors, postings, norms, k))
+
+
+def rebuild_similarities():
+    """
+    Recomputes the whole top-k similarity table in one batch.
+    """
+    vectors = _load_vectors()
+
+    db.session.query(CocktailSimilarity).delete(synchronize_session=False)
+    rows = []
+    for row in _similarity_rows(
+            vectors, current_app.config['SIMILAR_COCKTAILS_TOP_K']):
+        rows.append(row)
+        if len(rows) >= 1000:
+            db.session.bulk_insert_mappings(CocktailSimilarity, rows)
+            rows = []
+    db.session.bulk_insert_mappings(CocktailSimilarity, rows)
+    db.session.commit()
+
+    return len(vectors)
+
+
+def refresh_similarities(cocktail_ids):
+    """
+    Fully recomputes the top-k rows of the given cocktails.
+    """
+    k = current_app.config['SIMILAR_COCKTAILS_TOP_K']
+    rows_by_cocktail = {}
+
+    for cocktail_id in cocktail_ids:
+        vectors = _neighbour_vectors(cocktail_id)
+        postings = _postings(vectors)
+        norms = {other_id: _norm(vector)
+                 for other_id, vector in vectors.items()}
+        rows_by_cocktail[cocktail_id] = _to_rows(
+            cocktail_id, _top_k(cocktail_id, vectors, postings, norms, k))
+
+    _replace_rows(rows_by_cocktail)
+    db.session.commit()
+
+
+def update_similarities(cocktail_id):
+    """
+    Incrementally updates the similarity table after a cocktail was added
+    or edited. The cocktail's own row is recomputed and its new score is
+    merged into the rows of its neighbours. A neighbour is only recomputed
+    from scratch when the cocktail drops out of its top-k, since the entry
+    replacing it is unknown.
+    """
+    k = current_app.config['SIMILAR_COCKTAILS_TOP_K']
+    vectors = _neighbour_vectors(cocktail_id)
+    postings = _postings(vectors)
+    norms = {other_id: _norm(vector) for other_id, vector in vectors.items()}
+    vector = vectors.get(cocktail_id, {})
+
+    rows_by_cocktail = {
+        cocktail_id: _to_rows(
+            cocktail_id, _top_k(cocktail_id, vectors, postings, norms, k))
+    }
+    recompute = []
+
+    # Full stored lists of the current neighbours and of every cocktail
+    # listing this one, which may no longer share an ingredient with it.
+    listing_ids = db.session.query(CocktailSimilarity.cocktail_id) \
+        .filter(CocktailSimilarity.similar_id == cocktail_id)
+    stored = {}
+    for row in CocktailSimilarity.query.filter(
+            CocktailSimilarity.cocktail_id.in_(list(vectors)) |
+            CocktailSimilarity.cocktail_id.in_(listing_ids)):
+        stored.setdefault(row.cocktail_id, []).append(
+            (row.score, row.similar_id))
+
+    for other_id in set(vectors) | set(stored):
+        if other_id == cocktail_id:
+            continue
+
+        entries = stored.get(other_id, [])
+        old = [score for score, similar_id in entries
+               if similar_id == cocktail_id]
+        score = _cosine(vectors[other_id], vector) \
+            if other_id in vectors else 0.0
+
+        if old and score < old[0] and len(entries) >= k:
+            recompute.append(other_id)
+            continue
+
+        top = [entry for entry in entries if entry[1] != cocktail_id]
+        if score > 0:
+            top.append((score, cocktail_id))
+        top = heapq.nlargest(k, top)
+
+        if top != sorted(entries, reverse=True):
+            rows_by_cocktail[other_id] = _to_rows(other_id, top)
+
+    _replace_rows(rows_by_cocktail)
+    db.session.commit()
+
+    if recompute:
+        refresh_similarities(recompute)
+
+
+def detach_similarities(cocktail_ids):
+    """
+    Removes every similarity row pointing to or from cocktails that are
+    about to be deleted, inside the caller's transaction. Returns the ids of
+    the remaining cocktails whose top-k lists lost an entry.
+    """
+    affected = [other_id for (other_id, ) in db.session.query(
+        CocktailSimilarity.cocktail_id).filter(
+        CocktailSimilarity.similar_id.in_(cocktail_ids),
+        ~CocktailSimilarity.cocktail_id.in_(cocktail_ids)).distinct()]
+
+    db.session.query(CocktailSimilarity).filter(
+        CocktailSimilarity.cocktail_id.in_(cocktail_ids) |
+        CocktailSimilarity.similar_id.in_(cocktail_ids)).delete(
+        synchronize_session=False)
+
+    return affected
+
+
+class SimilarityUpdater(object):
+    """
+    Runs similarity maintenance after a write. Updating the neighbours of a
+    cocktail reads every cocktail sharing an ingredient with it, which is
+    too slow for the write request, so with SIMILARITY_UPDATE_ASYNC each
+    worker hands the updates to one background thread. Similar lists are
+    then eventually consistent; updates still queued when the worker exits
+    are lost until the next `flask rebuild-similar`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            app, fn, args = self._queue.get()
+            with app.app_context():
+                try:
+                    fn(*args)
+                except exc.SQLAlchemyError as e:
+                    logger.warning('Similarity update failed: %s', e)
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+    def submit(self, fn, *args):
+        if not current_app.config['SIMILARITY_UPDATE_ASYNC']:
+            fn(*args)
+            return
+
+        # Started lazily, so a gunicorn master never owns the thread.
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='similarity-updater', daemon=True)
+                self._thread.start()
+        self._queue.put((current_app._get_current_object(), fn, args))
+
+
+similarity_updater = SimilarityUpdater()
@@ -0,0 +1,103 @@
+import hashlib
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from server import db
+
+
+class _Call(object):
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _lock_id(key):
+    digest = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=8)
+    return int.from_bytes(digest.digest(), 'big', signed=True)
+
+
+class SingleFlight(object):
+    """
+    Coalesces identical concurrent calls inside a worker: the first caller
+    of a key runs the function, later callers wait for it and share its
+    result (or its exception). Results are handed to other threads, so they
+    must be plain data and never ORM instances.
+
+    With SINGLE_FLIGHT_CROSS_PROCESS enabled the leader also takes a
+    transaction-level Postgres advisory lock on the key, so one worker runs
+    the query while the leaders of the other workers wait. Once they get
+    the lock they call recheck first and return its result if it has one,
+    typically what the first worker stored in the shared cache. The lock
+    goes away with the request's transaction, also when the query failed.
+    A leader waiting longer than SINGLE_FLIGHT_LOCK_TIMEOUT seconds runs
+    the query without it. Other databases only coalesce inside the worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, recheck=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(key, fn, recheck)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+        return call.result
+
+    @staticmethod
+    def _lock(key):
+        """
+        Polls for the advisory lock instead of blocking in
+        pg_advisory_xact_lock, so a stuck leader elsewhere cannot hang the
+        request. Returns whether the lock was taken.
+        """
+        lock_id = _lock_id(key)
+        deadline = time.monotonic() + \
+            current_app.config['SINGLE_FLIGHT_LOCK_TIMEOUT']
+        while True:
+            if db.session.execute(select(
+                    [func.pg_try_advisory_xact_lock(lock_id)])).scalar():
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.02)
+
+    @classmethod
+    def _run(cls, key, fn, recheck):
+        if not current_app.config['SINGLE_FLIGHT_CROSS_PROCESS'] or \
+                db.session.bind.dialect.name != 'postgresql':
+            return fn()
+
+        if cls._lock(key) and recheck is not None:
+            result = recheck()
+            if result is not None:
+                return result
+
+        return fn()
+
+
+catalog_flight = SingleFlight()
@@ -0,0 +1,251 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from array import array
+
+from flask import current_app
+
+from server import db
+from server.catalog.cache import catalog_cache
+from server.catalog.changes import latest_seq
+from server.catalog.filters import group_filters
+from server.extensions import cache
+from server.models import CocktailCard, Ingredient
+
+MAGIC = b'CBSN'
+FORMAT_VERSION = 2
+
+# magic, format version, change log seq, cocktail count, ingredient count
+# and the start and end offsets of the seven sections. Sections start on
+# 8-byte boundaries so the numeric ones can be cast in place.
+_HEADER = struct.Struct('<4sHQII14Q')
+_DATA_START = -(-_HEADER.size // 8) * 8
+
+# Sections, in file order:
+#   ids              cocktail ids (16 bytes each) sorted by id
+#   id_index         position of each id in name order (uint32)
+#   doc_offsets      start of every JSON document, plus the end (uint64)
+#   docs             UTF-8 JSON cocktail documents in name order
+#   ingredients      JSON list of [name, type] in name order
+#   posting_offsets  start of every ingredient posting, plus the end (uint32)
+#   postings         cocktail positions of every ingredient (uint32)
+
+
+def _pad(buffer):
+    buffer.extend(b'\0' * (-len(buffer) % 8))
+
+
+def build_snapshot(path):
+    """
+    Serializes the catalog into a read-only binary file and atomically
+    replaces the file at path with it. Returns the number of cocktails.
+
+    The file is stamped with the latest change log seq, read before the
+    catalog, so a write racing with the build makes it stale, never the
+    other way round.
+    """
+    version = latest_seq()
+
+    cards = db.session.query(CocktailCard.cocktail_id, CocktailCard.document,
+                             CocktailCard.ingredient_names) \
+        .order_by(CocktailCard.name).all()
+    ingredients = db.session.query(Ingredient.name, Ingredient.type) \
+        .order_by(Ingredient.name).all()
+
+    positions = {name: i for i, (name, _) in enumerate(ingredients)}
+    postings = [array('I') for _ in ingredients]
+    doc_offsets = array('Q')
+    docs = bytearray()
+
+    for position, (_, document, names) in enumerate(cards):
+        doc_offsets.append(len(docs))
+        docs.extend(json.dumps(document, separators=(',', ':'))
+                    .encode('utf-8'))
+        for name in names:
+            if name in positions:
+                postings[positions[name]].append(position)
+    doc_offsets.append(len(docs))
+
+    by_id = sorted(range(len(cards)), key=lambda i: cards[i][0].bytes)
+    posting_offsets = array('I', [0])
+    for posting in postings:
+        posting_offsets.append(posting_offsets[-1] + len(posting))
+
+    sections = [
+        b''.join(cards[i][0].bytes for i in by_id),
+        array('I', by_id).tobytes(),
+        doc_offsets.tobytes(),
+        bytes(docs),
+        json.dumps([list(row) for row in ingredients]).encode('utf-8'),
+        posting_offsets.tobytes(),
+        b''.join(posting.tobytes() for posting in postings)
+    ]
+
+    body = bytearray()
+    offsets = []
+    for section in sections:
+        _pad(body)
+        offsets.append(_DATA_START + len(body))
+        body.extend(section)
+        offsets.append(_DATA_START + len(body))
+
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, version, len(cards),
+                          len(ingredients), *offsets)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(header.ljust(_DATA_START, b'\0'))
+        f.write(body)
+    os.replace(tmp, path)
+
+    return len(cards)
+
+
+class CatalogSnapshot(object):
+    """
+    Read-only view of a snapshot file. The file is mapped into memory once
+    and shared by every worker through the page cache; documents are only
+    decoded when they are read.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, format_version, self.version, self.count, ingredient_count,
+         *offsets) = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f'{path} is not a catalog snapshot')
+
+        view = memoryview(self._mmap)
+        sections = [view[start:end]
+                    for start, end in zip(offsets[::2], offsets[1::2])]
+        self._ids = sections[0]
+        self._id_index = sections[1].cast('I')
+        self._doc_offsets = sections[2].cast('Q')
+        self._docs = sections[3]
+        self._ingredients = json.loads(bytes(sections[4]))
+        self._posting_offsets = sections[5].cast('I')
+        self._postings = sections[6].cast('I')
+        self._positions = {name: i
+                           for i, (name, _) in enumerate(self._ingredients)}
+
+    def _document(self, position):
+        start = self._doc_offsets[position]
+        end = self._doc_offsets[position + 1]
+        return json.loads(bytes(self._docs[start:end]))
+
+    def _posting(self, name):
+        position = self._positions.get(name)
+        if position is None:
+            return ()
+        start = self._posting_offsets[position]
+        end = self._posting_offsets[position + 1]
+        return self._postings[start:end]
+
+    def get(self, cocktail_id):
+        try:
+            key = uuid.UUID(str(cocktail_id)).bytes
+        except ValueError:
+            return None
+
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = self._ids[mid * 16:mid * 16 + 16].tobytes()
+            if current == key:
+                return self._document(self._id_index[mid])
+            if current < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return None
+
+    def find(self, ingredients, curr_page, num_of_cocktails=20):
+        """
+        Returns a page of cocktails containing all the given ingredients,
+        in name order, and the total number of matches.
+        """
+        if ingredients:
+            postings = sorted((self._posting(name) for name in ingredients),
+                              key=len)
+            matches = set(postings[0])
+            for posting in postings[1:]:
+                matches.intersection_update(posting)
+            matches = sorted(matches)
+        else:
+            matches = range(self.count)
+
+        start = (curr_page - 1) * num_of_cocktails
+        return ([self._document(position) for position in
+                 matches[start:start + num_of_cocktails]], len(matches))
+
+    def filters(self):
+        return group_filters(self._ingredients)
+
+
+class SnapshotStore(object):
+    """
+    Holds the snapshot of this worker. The snapshot is only served while it
+    was built at the latest change log seq, which unlike the cache version
+    survives restarts and cache flushes. The file and the seq are checked at
+    most once per CATALOG_SNAPSHOT_POLL_INTERVAL, and right away when the
+    catalog cache version moves. That needs a cache backend shared by every
+    worker; with the per-process memory backend writes of other workers
+    would go unnoticed until the next check, so reads always go to the
+    database.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._stat = None
+        self._seq = None
+        self._cache_version = None
+        self._checked_at = 0.0
+
+    def _refresh(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._snapshot, self._stat = None, None
+            return
+
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key != self._stat:
+            try:
+                self._snapshot = CatalogSnapshot(path)
+            except (OSError, ValueError, struct.error):
+                self._snapshot = None
+            self._stat = key
+
+    def current(self):
+        path = current_app.config['CATALOG_SNAPSHOT_PATH']
+        if not path or cache.backend.name == 'memory':
+            return None
+
+        now = time.monotonic()
+        version = catalog_cache.version
+        if version != self._cache_version or now - self._checked_at >= \
+                current_app.config['CATALOG_SNAPSHOT_POLL_INTERVAL']:
+            with self._lock:
+                self._refresh(path)
+                self._seq = latest_seq()
+                self._cache_version = version
+                self._checked_at = now
+
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.version != self._seq:
+            return None
+
+        return snapshot
+
+
+catalog_snapshot = SnapshotStore()
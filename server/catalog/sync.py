@@ -0,0 +1,63 @@
+from server.catalog.autocomplete import autocomplete_index
+from server.catalog.cache import catalog_cache
+from server.catalog.pantry import pantry_index
+from server.catalog.similarity import (update_similarities,
+                                       refresh_similarities,
+                                       similarity_updater)
+
+
+def cocktail_saved(cocktail):
+    """
+    Propagates an added or edited cocktail to the catalog indexes and the
+    similarity table. Must be called after the change is committed.
+    """
+    catalog_cache.bump()
+    pantry_index.update(cocktail)
+    autocomplete_index.update(cocktail)
+    similarity_updater.submit(update_similarities, cocktail.id)
+
+
+def cocktail_deleted(cocktail_id, neighbour_ids=()):
+    """
+    Drops a deleted cocktail from the in-memory catalog indexes and refills
+    the similarity lists of the cocktails it was removed from.
+    """
+    catalog_cache.bump()
+    pantry_index.remove(cocktail_id)
+    autocomplete_index.remove(cocktail_id)
+    if neighbour_ids:
+        similarity_updater.submit(refresh_similarities,
+                                  list(neighbour_ids))
+
+
+def cocktails_deleted(cocktail_ids, neighbour_ids=()):
+    """
+    Propagates a bulk delete. The in-memory indexes are dropped and rebuilt
+    on their next use instead of removing the cocktails one by one, since a
+    bulk delete may also have removed ingredients.
+    """
+    catalog_cache.bump()
+    pantry_index.invalidate()
+    autocomplete_index.invalidate()
+    if neighbour_ids:
+        similarity_updater.submit(refresh_similarities,
+                                  list(neighbour_ids))
+
+
+def references_renamed():
+    """
+    Propagates a committed rename of an ingredient, glassware or method
+    used by cocktails to the caches and in-memory indexes.
+    """
+    catalog_cache.bump()
+    pantry_index.invalidate()
+    autocomplete_index.invalidate()
+
+
+def catalog_changed():
+    """
+    Called when another worker changed the catalog. The in-memory indexes of
+    this worker are dropped and rebuilt on their next use.
+    """
+    pantry_index.invalidate()
+    autocomplete_index.invalidate()
@@ -0,0 +1,37 @@
+import time
+
+from flask import current_app
+from sqlalchemy import exc
+
+from server import db
+from server.catalog.autocomplete import autocomplete_index
+from server.catalog.cache import catalog_cache
+from server.catalog.pantry import pantry_index
+from server.catalog.snapshot import catalog_snapshot
+
+
+def warm_up():
+    """
+    Builds the in-memory catalog indexes and maps the catalog snapshot, so
+    the first requests of a worker do not pay for it. In preload mode this
+    runs once in the gunicorn master and the workers inherit the result
+    through fork. Returns the time it took in seconds.
+
+    The catalog version is read before anything is built, so a worker
+    forked with these indexes notices any write committed since and
+    rebuilds them on its first version poll.
+    """
+    start = time.perf_counter()
+
+    try:
+        catalog_cache.version
+        pantry_index.warm_up()
+        autocomplete_index.warm_up()
+        catalog_snapshot.current()
+    except exc.SQLAlchemyError as e:
+        # e.g. a release phase running before the migrations.
+        current_app.logger.warning('Catalog warm-up skipped: %s', e)
+    finally:
+        db.session.remove()
+
+    return time.perf_counter() - start
@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+bp = Blueprint('cli', __name__, cli_group=None)
+
+from server.cli import commands
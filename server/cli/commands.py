@@ -0,0 +1,152 @@
+import time
+import uuid
+
+import click
+from flask import current_app
+
+from server import db
+from server.cli import bp
+from server.catalog.bulk import select_cocktail_ids, delete_cocktails
+from server.catalog.cards import rebuild_cards
+from server.catalog.explain import explain_hot_queries
+from server.catalog.seed import seed_catalog
+from server.catalog.similarity import rebuild_similarities
+from server.catalog.snapshot import build_snapshot
+from server.catalog.sync import cocktails_deleted
+from server.models import User, TokenBlacklist
+
+
+@bp.cli.command('rebuild-similar')
+def rebuild_similar():
+    """Recompute the top-k similar cocktail table."""
+    count = rebuild_similarities()
+    click.echo(f'Rebuilt similar cocktails for {count} cocktails')
+
+
+@bp.cli.command('rebuild-cards')
+def rebuild_cocktail_cards():
+    """Recreate the denormalized cocktail card read model."""
+    count = rebuild_cards()
+    click.echo(f'Rebuilt cards for {count} cocktails')
+
+
+@bp.cli.command('build-snapshot')
+@click.option('--path', default=None,
+              help='Output file, CATALOG_SNAPSHOT_PATH by default.')
+def build_catalog_snapshot(path):
+    """Write the memory-mapped catalog snapshot served by the workers."""
+    path = path or current_app.config['CATALOG_SNAPSHOT_PATH']
+    if not path:
+        raise click.ClickException('CATALOG_SNAPSHOT_PATH is not set')
+
+    start = time.perf_counter()
+    count = build_snapshot(path)
+    click.echo(f'Wrote {count} cocktails to {path} in '
+               f'{time.perf_counter() - start:.2f}s')
+
+
+@bp.cli.command('seed-catalog')
+@click.option('--cocktails', default=1000, help='Number of cocktails.')
+@click.option('--ingredients', default=200, help='Number of ingredients.')
+@click.option('--seed', default=0, help='Random seed.')
+@click.option('--similar', is_flag=True,
+              help='Also rebuild the similar cocktail table.')
+def seed(cocktails, ingredients, seed, similar):
+    """Fill the catalog with synthetic cocktails."""
+    cocktail_count, association_count = seed_catalog(
+        cocktails, ingredients, seed, similar)
+    click.echo(f'Seeded {cocktail_count} cocktails with '
+               f'{association_count} ingredients')
+
+
+@bp.cli.command('delete-cocktails')
+@click.option('--id', 'cocktail_ids', multiple=True, type=click.UUID,
+              help='Cocktail id, repeatable.')
+@click.option('--search', default=None,
+              help='Delete cocktails matching this search term.')
+@click.option('--ingredient', 'ingredients', multiple=True,
+              help='Delete cocktails containing this ingredient, '
+                   'repeatable.')
+@click.option('--gc', is_flag=True,
+              help='Also delete unused ingredients, glassware and methods.')
+@click.option('--yes', is_flag=True, help='Do not ask for confirmation.')
+def delete_many_cocktails(cocktail_ids, search, ingredients, gc, yes):
+    """Delete many cocktails by id or by filter."""
+    if cocktail_ids and (search or ingredients):
+        raise click.UsageError('Pass either --id or a filter, not both')
+
+    if not cocktail_ids:
+        if not search and not ingredients:
+            raise click.UsageError('Pass --id, --search or --ingredient')
+        cocktail_ids = select_cocktail_ids(
+            search.lower() if search else None, sorted(ingredients))
+
+    if not yes:
+        click.confirm(f'Delete {len(cocktail_ids)} cocktails?', abort=True)
+
+    deleted_ids, neighbour_ids, counts = delete_cocktails(cocktail_ids, gc)
+    db.session.commit()
+    if deleted_ids:
+        cocktails_deleted(deleted_ids, neighbour_ids)
+
+    click.echo(', '.join(f'{count} {table}'
+                         for table, count in counts.items()) + ' deleted')
+
+
+@bp.cli.command('explain-queries')
+@click.option('--min-rows', default=1000,
+              help='Tables with at least this many rows count as large.')
+def explain_queries(min_rows):
+    """Fail if a hot query sequentially scans a large table."""
+    if db.engine.dialect.name != 'postgresql':
+        raise click.ClickException('explain-queries needs PostgreSQL')
+
+    failed = False
+
+    for scenario, statement, violations in explain_hot_queries(min_rows):
+        if statement is None:
+            failed = True
+            click.echo(f'FAIL {scenario}: {", ".join(violations)}')
+        elif violations:
+            failed = True
+            click.echo(f'FAIL {scenario}: sequential scan on '
+                       f'{", ".join(violations)}')
+            click.echo(f'     {" ".join(statement.split())}')
+        else:
+            click.echo(f'ok   {scenario}')
+
+    if failed:
+        raise SystemExit(1)
+
+
+@bp.cli.command('bench-login')
+@click.option('--logins', default=100, help='Number of logins to time.')
+def bench_login(logins):
+    """Measure login throughput of a single worker."""
+    username = f'bench-{uuid.uuid4()}'
+    password = uuid.uuid4().hex
+    user = User(username=username)
+    user.set_password(password)
+    db.session.add(user)
+    db.session.commit()
+
+    client = current_app.test_client()
+    try:
+        start = time.perf_counter()
+        for _ in range(logins):
+            response = client.post('/admin/login', json={
+                'username': username,
+                'password': password
+            })
+            if response.status_code != 200:
+                raise click.ClickException(
+                    f'Login failed with {response.status_code}')
+        elapsed = time.perf_counter() - start
+    finally:
+        TokenBlacklist.query.filter_by(user_identity=str(user.id)).delete()
+        db.session.delete(user)
+        db.session.commit()
+
+    click.echo(f'{logins} logins in {elapsed:.2f}s, '
+               f'{logins / elapsed:.1f} logins/second per worker '
+               f'({current_app.config["PASSWORD_HASH_METHOD"]})')
@@ -0,0 +1,49 @@
+import uuid
+
+from sqlalchemy import BigInteger, CHAR, Integer, JSON, String, Text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID
+from sqlalchemy.types import TypeDecorator
+
+
+class GUID(TypeDecorator):
+    """
+    UUID column stored natively on Postgres and as 32 hex characters on
+    other databases. Values are uuid.UUID instances on every dialect.
+    """
+
+    impl = CHAR(32)
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(UUID(as_uuid=True))
+
+        return dialect.type_descriptor(CHAR(32))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name == 'postgresql':
+            return value
+
+        if not isinstance(value, uuid.UUID):
+            value = uuid.UUID(str(value))
+
+        return value.hex
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+
+        return uuid.UUID(value)
+
+
+def StringArray(length=255):
+    """
+    Postgres text array, stored as a JSON list on SQLite.
+    """
+    return ARRAY(String(length)).with_variant(JSON(), 'sqlite')
+
+
+# JSONB on Postgres, JSON elsewhere.
+JSONDocument = JSON().with_variant(JSONB(astext_type=Text()), 'postgresql')
+
+# SQLite only auto-increments INTEGER PRIMARY KEY columns.
+BigSerial = BigInteger().with_variant(Integer(), 'sqlite')
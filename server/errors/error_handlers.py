@@ -6,6 +6,8 @@ from server.errors import bp
 def get_error_response(error, code):
     response = make_response(jsonify(
         {'message': error.description, 'status': code, }), code)
+    if getattr(error, 'retry_after', None):
+        response.headers['Retry-After'] = str(error.retry_after)
     return response
 
 
@@ -26,7 +28,18 @@ def not_found_error(error):
     return get_error_response(error, 404)
 
 
+@bp.app_errorhandler(429)
+def too_many_requests_error(error):
+    return get_error_response(error, 429)
+
+
 @bp.app_errorhandler(500)
 def internal_error(error):
     db.session.rollback()
     return get_error_response(error, 500)
+
+
+@bp.app_errorhandler(503)
+def service_unavailable_error(error):
+    db.session.rollback()
+    return get_error_response(error, 503)
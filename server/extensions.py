@@ -2,6 +2,9 @@ from flask_jwt_extended import JWTManager
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 
+from server.cache import Cache
+
 jwt = JWTManager()
 db = SQLAlchemy()
 migrate = Migrate()
+cache = Cache()
@@ -1,11 +1,14 @@
 from datetime import datetime
-from flask import abort
+import uuid
+from flask import abort, current_app
 from sqlalchemy import exc
 from sqlalchemy.orm.exc import NoResultFound
-from flask_jwt_extended import decode_token
+from flask_jwt_extended import (create_access_token, create_refresh_token,
+                                decode_token)
 
 from server.models import TokenBlacklist
 from server import db
+from server.extensions import cache
 
 
 def _epoch_utc_to_datetime(epoch_utc):
@@ -16,30 +19,37 @@ def _epoch_utc_to_datetime(epoch_utc):
     return datetime.fromtimestamp(epoch_utc)
 
 
-def add_token_to_database(encoded_token, identity_claim):
+def create_token_pair(identity):
     """
-    Adds a new token to the database. It is not revoked when it is added.
+    Creates an access and a refresh token for the given identity with
+    flask_jwt_extended and returns them together with their decoded claims,
+    so they can be stored in one insert.
     """
-    decoded_token = decode_token(encoded_token)
-    jti = decoded_token['jti']
-    token_type = decoded_token['type']
-    user_identity = decoded_token[identity_claim]
-    expires = _epoch_utc_to_datetime(decoded_token['exp'])
-    revoked = False
-
-    db_token = TokenBlacklist(
-        jti=jti,
-        token_type=token_type,
-        user_identity=user_identity,
-        expires=expires,
-        revoked=revoked,
-    )
+    access_token = create_access_token(identity=identity)
+    refresh_token = create_refresh_token(identity=identity)
+
+    return (access_token, refresh_token,
+            [decode_token(access_token), decode_token(refresh_token)])
 
-    try:
-        db.session.add(db_token)
-        db.session.commit()
-    except exc.SQLAlchemyError:
-        abort(500, 'Internal server error')
+
+def add_claims_to_database(claims_list, identity_claim):
+    """
+    Adds the tokens described by the given claims to the database in a
+    single insert. Does not commit, so the tokens are stored in the caller's
+    transaction.
+    """
+    rows = []
+    for claims in claims_list:
+        rows.append({
+            'id': uuid.uuid4(),
+            'jti': claims['jti'],
+            'token_type': claims['type'],
+            'user_identity': claims[identity_claim],
+            'expires': _epoch_utc_to_datetime(claims['exp']),
+            'revoked': False
+        })
+
+    db.session.execute(TokenBlacklist.__table__.insert().values(rows))
 
 
 def is_token_revoked(decoded_token):
@@ -47,14 +57,29 @@ def is_token_revoked(decoded_token):
     Checks if the given token is revoked or not. Because we are adding all the
     tokens that we create into this database, if the token is not present
     in the database we are going to consider it revoked, as we don't know where
-    it was created.
+    it was created. With a shared cache backend the answer is cached for
+    TOKEN_CACHE_TTL seconds in the versioned "tokens" namespace, which is
+    bumped when a token is revoked or unrevoked; an answer read before the
+    bump is filed under the old version and never served after it. A
+    per-process cache could not be dropped in other workers.
     """
     jti = decoded_token['jti']
+    tokens = cache.namespace('tokens')
+    shared = cache.backend.name != 'memory'
+    version = tokens.version
+    revoked = tokens.get(jti, version=version) if shared else None
+    if revoked is not None:
+        return revoked
+
     try:
-        token = TokenBlacklist.query.filter_by(jti=jti).one()
-        return token.revoked
+        revoked = TokenBlacklist.query.filter_by(jti=jti).one().revoked
     except NoResultFound:
-        return True
+        revoked = True
+
+    if shared:
+        tokens.set(jti, revoked, current_app.config['TOKEN_CACHE_TTL'],
+                   version=version)
+    return revoked
 
 
 def revoke_token(jti, user):
@@ -67,6 +92,7 @@ def revoke_token(jti, user):
             jti=jti, user_identity=user).one()
         token.revoked = True
         db.session.commit()
+        cache.namespace('tokens').bump()
     except NoResultFound:
         abort(401, 'Token not found')
     except exc.SQLAlchemyError:
@@ -83,6 +109,7 @@ def unrevoke_token(token_id, user):
             id=token_id, user_identity=user).one()
         token.revoked = False
         db.session.commit()
+        cache.namespace('tokens').bump()
     except NoResultFound:
         abort(401, 'Token not found')
 
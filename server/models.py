@@ -1,18 +1,21 @@
+from flask import current_app
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.associationproxy import association_proxy
+from sqlalchemy.orm import validates
+from datetime import datetime
 import uuid
 
 from server import db
+from server.catalog.quantities import parse_amount
+from server.db_types import GUID, BigSerial, JSONDocument, StringArray
 
 
 class User(db.Model):
     __tablename__ = 'user'
 
-    id = db.Column(UUID(as_uuid=True),
+    id = db.Column(GUID(),
                    primary_key=True,
                    default=uuid.uuid4,
-                   unique=True,
                    nullable=False)
     username = db.Column(db.String(255),
                          unique=True,
@@ -24,11 +27,19 @@ class User(db.Model):
         return f'<User {self.id} {self.username}>'
 
     def set_password(self, password):
-        self.password = generate_password_hash(password)
+        self.password = generate_password_hash(
+            password,
+            method=current_app.config['PASSWORD_HASH_METHOD'],
+            salt_length=current_app.config['PASSWORD_SALT_LENGTH'])
 
     def check_password(self, password):
         return check_password_hash(self.password, password)
 
+    def password_needs_rehash(self):
+        method, salt, _ = self.password.split('$', 2)
+        return (method != current_app.config['PASSWORD_HASH_METHOD'] or
+                len(salt) != current_app.config['PASSWORD_SALT_LENGTH'])
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -40,25 +51,29 @@ class User(db.Model):
 class CocktailIngredients(db.Model):
     __tablename__ = 'cocktail_ingredients'
 
-    id = db.Column(UUID(as_uuid=True),
+    id = db.Column(GUID(),
                    primary_key=True,
                    default=uuid.uuid4,
-                   unique=True,
                    nullable=False)
-    cocktail_id = db.Column(UUID(as_uuid=True),
+    cocktail_id = db.Column(GUID(),
                             db.ForeignKey('cocktail.id'),
-                            primary_key=True)
+                            primary_key=True,
+                            index=True)
     cocktail = db.relationship('Cocktail',
                                backref=db.backref('cocktail_ingredients',
                                                   cascade='all, delete-orphan')
                                )
-    ingredient_id = db.Column(UUID(as_uuid=True),
-                              db.ForeignKey('ingredient.id'), primary_key=True)
+    ingredient_id = db.Column(GUID(),
+                              db.ForeignKey('ingredient.id'), primary_key=True,
+                              index=True)
     ingredient = db.relationship('Ingredient',
                                  backref=db.backref('cocktail_ingredients',
                                                     cascade='all, '
                                                             'delete-orphan'))
     amount = db.Column(db.String(255))
+    # Parsed from amount: volumes in ml, otherwise a counted unit.
+    quantity = db.Column(db.Float)
+    unit = db.Column(db.String(20))
     main = db.Column(db.Boolean, default=False)
 
     def __init__(self,
@@ -74,18 +89,30 @@ class CocktailIngredients(db.Model):
     def __repr__(self):
         return f'<Cocktail_Ingredients {self.id}>'
 
+    @validates('amount')
+    def validate_amount(self, key, amount):
+        self.quantity, self.unit = parse_amount(amount)
+        return amount
+
 
 class Cocktail(db.Model):
     __tablename__ = 'cocktail'
 
-    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4,
-                   unique=True, nullable=False)
-    name = db.Column(db.String(255), nullable=False)
+    id = db.Column(GUID(), primary_key=True, default=uuid.uuid4,
+                   nullable=False)
+    name = db.Column(db.String(255), nullable=False, index=True)
     preparation = db.Column(db.String())
     garnish = db.Column(db.String(255))
-    glassware_id = db.Column(UUID(as_uuid=True), db.ForeignKey('glassware.id'))
-    method_id = db.Column(UUID(as_uuid=True), db.ForeignKey('method.id'))
+    glassware_id = db.Column(GUID(), db.ForeignKey('glassware.id'),
+                             index=True)
+    method_id = db.Column(GUID(), db.ForeignKey('method.id'),
+                          index=True)
     img_url = db.Column(db.String(), default='')
+    # Maintained in batches by server.catalog.popularity.
+    views = db.Column(db.BigInteger, nullable=False, default=0,
+                      server_default='0', index=True)
+    search_hits = db.Column(db.BigInteger, nullable=False, default=0,
+                            server_default='0')
     ingredients = association_proxy('cocktail_ingredients', 'ingredient',
                                     creator=lambda i: CocktailIngredients(
                                         ingredient=i))
@@ -110,13 +137,77 @@ class Cocktail(db.Model):
         }
 
 
+class CocktailCard(db.Model):
+    __tablename__ = 'cocktail_card'
+
+    cocktail_id = db.Column(GUID(),
+                            db.ForeignKey('cocktail.id'),
+                            primary_key=True)
+    cocktail = db.relationship('Cocktail',
+                               backref=db.backref('card',
+                                                  uselist=False,
+                                                  cascade='all, delete-orphan')
+                               )
+    name = db.Column(db.String(255), nullable=False, index=True)
+    img_url = db.Column(db.String())
+    search_text = db.Column(db.String(), nullable=False)
+    ingredient_names = db.Column(StringArray(255), nullable=False)
+    document = db.deferred(db.Column(JSONDocument, nullable=False))
+
+    __table_args__ = (
+        db.Index('ix_cocktail_card_ingredient_names', ingredient_names,
+                 postgresql_using='gin'),
+        db.Index('ix_cocktail_card_search_text', search_text,
+                 postgresql_using='gin',
+                 postgresql_ops={'search_text': 'gin_trgm_ops'}),
+    )
+
+    def __repr__(self):
+        return f'<Cocktail_Card {self.name}>'
+
+    def to_dict(self):
+        return self.document
+
+
+class CocktailSimilarity(db.Model):
+    __tablename__ = 'cocktail_similarity'
+
+    cocktail_id = db.Column(GUID(),
+                            db.ForeignKey('cocktail.id'),
+                            primary_key=True)
+    similar_id = db.Column(GUID(),
+                           db.ForeignKey('cocktail.id'),
+                           primary_key=True,
+                           index=True)
+    rank = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<Cocktail_Similarity {self.cocktail_id} {self.similar_id}>'
+
+
+class CatalogChange(db.Model):
+    __tablename__ = 'catalog_change'
+
+    seq = db.Column(BigSerial, primary_key=True)
+    cocktail_id = db.Column(GUID(), nullable=False, index=True)
+    operation = db.Column(db.String(10), nullable=False)
+    changed_at = db.Column(db.DateTime,
+                           nullable=False,
+                           default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Catalog_Change {self.seq} {self.operation} ' \
+               f'{self.cocktail_id}>'
+
+
 class Ingredient(db.Model):
     __tablename__ = 'ingredient'
 
-    id = db.Column(UUID(as_uuid=True),
+    id = db.Column(GUID(),
                    primary_key=True,
                    default=uuid.uuid4,
-                   unique=True, nullable=False)
+                   nullable=False)
     name = db.Column(db.String(255), nullable=False, unique=True)
     type = db.Column(db.String(255), nullable=False)
     cocktails = association_proxy('cocktail_ingredients',
@@ -131,10 +222,10 @@ class Ingredient(db.Model):
 class Method(db.Model):
     __tablename__ = 'method'
 
-    id = db.Column(UUID(as_uuid=True),
+    id = db.Column(GUID(),
                    primary_key=True,
                    default=uuid.uuid4,
-                   unique=True, nullable=False)
+                   nullable=False)
     name = db.Column(db.String(255), nullable=False, unique=True)
     cocktails = db.relationship('Cocktail',
                                 backref='method',
@@ -153,10 +244,10 @@ class Method(db.Model):
 class Glassware(db.Model):
     __tablename__ = 'glassware'
 
-    id = db.Column(UUID(as_uuid=True),
+    id = db.Column(GUID(),
                    primary_key=True,
                    default=uuid.uuid4,
-                   unique=True, nullable=False)
+                   nullable=False)
     name = db.Column(db.String(255), nullable=False, unique=True)
     cocktails = db.relationship('Cocktail',
                                 backref='glassware',
@@ -174,12 +265,11 @@ class Glassware(db.Model):
 
 # Token helper model
 class TokenBlacklist(db.Model):
-    id = db.Column(UUID(as_uuid=True),
+    id = db.Column(GUID(),
                    primary_key=True,
                    default=uuid.uuid4,
-                   unique=True,
                    nullable=False)
-    jti = db.Column(db.String(36), nullable=False)
+    jti = db.Column(db.String(36), nullable=False, unique=True, index=True)
     token_type = db.Column(db.String(10), nullable=False)
     user_identity = db.Column(db.String(50), nullable=False)
     revoked = db.Column(db.Boolean, nullable=False)
@@ -0,0 +1,29 @@
+import os
+
+from flask_migrate import upgrade
+
+from config import TestConfig
+from server import create_app, db
+from server.catalog.seed import seed_catalog
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                          'migrations')
+
+
+def create_test_app(cocktails=0, ingredients=50, seed=0,
+                    config_class=TestConfig):
+    """
+    Creates an app on an in-memory SQLite database migrated to the latest
+    revision, optionally seeded with synthetic cocktails. No Postgres is
+    needed; its trigram and array indexes become plain indexes, array
+    filters use JSON matching and advisory locks are skipped.
+    """
+    app = create_app(config_class)
+
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+        if cocktails:
+            seed_catalog(cocktails, ingredients, seed)
+        db.session.remove()
+
+    return app
@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from server.catalog.pantry import pantry_index
+from server.models import Cocktail, Ingredient
+from server.testing import create_test_app
+
+
+@pytest.fixture
+def app():
+    pantry_index.invalidate()
+    app = create_test_app(cocktails=600, ingredients=40, seed=1)
+    with app.app_context():
+        yield app
+    pantry_index.invalidate()
+
+
+def _recipes():
+    return {
+        cocktail.id: (cocktail.name, [
+            (ci.ingredient.name, ci.ingredient.type, ci.main)
+            for ci in cocktail.cocktail_ingredients])
+        for cocktail in Cocktail.query.all()
+    }
+
+
+def _scan(recipes, pantry, max_missing, ignore_garnish):
+    have = {name.lower() for name in pantry}
+    matches = []
+    for cocktail_id, (name, ingredients) in recipes.items():
+        needed = [ing_name for ing_name, ing_type, main in ingredients
+                  if not ignore_garnish or main or ing_type != 'Mixer']
+        missing = sorted({ing_name for ing_name in needed
+                          if ing_name.lower() not in have}, key=str.lower)
+        if len(missing) <= max_missing:
+            matches.append((len(missing), name, cocktail_id, missing))
+
+    matches.sort(key=lambda match: match[:2])
+    return [(cocktail_id, missing)
+            for _, _, cocktail_id, missing in matches]
+
+
+def test_match_equals_brute_force_scan(app):
+    names = [name for (name, ) in Ingredient.query.with_entities(
+        Ingredient.name)]
+    cocktails = Cocktail.query.all()
+    recipes = _recipes()
+
+    pantry_index.warm_up()
+    for cocktail in cocktails[:50]:
+        pantry_index.remove(cocktail.id)
+        del recipes[cocktail.id]
+    for cocktail in cocktails[50:100]:
+        pantry_index.update(cocktail)
+
+    rng = random.Random(3)
+    for _ in range(40):
+        pantry = rng.sample(names, rng.randint(0, 25))
+        max_missing = rng.randint(0, 2)
+        ignore_garnish = rng.random() < 0.5
+        expected = _scan(recipes, pantry, max_missing, ignore_garnish)
+
+        total, result = pantry_index.match(
+            pantry, max_missing, ignore_garnish, 10, 50)
+
+        assert total == len(expected)
+        assert result == expected[10:50]
@@ -0,0 +1,27 @@
+import pytest
+
+from server.catalog.quantities import parse_amount
+
+
+@pytest.mark.parametrize('amount, expected', [
+    ('1 1/2 oz', (44.36, 'ml')),
+    ('30 ml', (30.0, 'ml')),
+    ('¾ oz', (22.18, 'ml')),
+    ('2 dashes', (1.84, 'ml')),
+    ('2-3 dashes', (1.84, 'ml')),
+    ('4 oz soda', (118.29, 'ml')),
+    ('2 fl oz gin', (59.15, 'ml')),
+    ('6 mint leaves', (6.0, 'leaf')),
+    ('2 lemon wedges', (2.0, 'wedge')),
+    ('1/2 lemon', (0.5, 'lemon')),
+    ('2 lemons', (2.0, 'lemon')),
+    ('3 cherries', (3.0, 'cherry')),
+    ('1 egg white', (1.0, 'egg white')),
+    ('A lime', (1.0, 'lime')),
+    ('2', (2.0, 'piece')),
+    ('Top up', (None, None)),
+    ('', (None, None)),
+    ('1 very long description of a garnish', (None, None)),
+])
+def test_parse_amount(amount, expected):
+    assert parse_amount(amount) == expected
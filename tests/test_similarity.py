@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from server.api_cocktail.controllers import delete_cocktail, edit_cocktail
+from server.catalog.similarity import rebuild_similarities
+from server.models import Cocktail, CocktailSimilarity, Ingredient
+from server.testing import create_test_app
+
+
+@pytest.fixture
+def app():
+    app = create_test_app(cocktails=200, ingredients=40, seed=2)
+    with app.app_context():
+        rebuild_similarities()
+        yield app
+
+
+def _table():
+    table = {}
+    for row in CocktailSimilarity.query.order_by(
+            CocktailSimilarity.cocktail_id, CocktailSimilarity.rank):
+        table.setdefault(row.cocktail_id, []).append(
+            (row.similar_id, round(row.score, 9)))
+
+    return table
+
+
+def test_incremental_updates_equal_full_rebuild(app):
+    rng = random.Random(5)
+    ingredients = Ingredient.query.all()
+    cocktails = Cocktail.query.all()
+
+    for cocktail in rng.sample(cocktails, 20):
+        edit_cocktail(cocktail.id, {
+            'name': cocktail.name,
+            'preparation': cocktail.preparation,
+            'garnish': cocktail.garnish,
+            'ingredients': [{
+                'name': ingredient.name,
+                'type': ingredient.type,
+                'amount': '1 oz',
+                'main': rng.random() < 0.3
+            } for ingredient in rng.sample(ingredients, rng.randint(1, 5))]
+        })
+
+    for cocktail in rng.sample(cocktails, 10):
+        delete_cocktail(cocktail.id)
+
+    incremental = _table()
+    rebuild_similarities()
+
+    assert incremental == _table()